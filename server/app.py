@@ -15,9 +15,19 @@ from employees_routes import employees_api
 from duties_routes import duties_api
 from performance_routes import performance_api
 from feeding_routes import feeding_bp
+from export_routes import export_api
+from dashboard_routes import dashboard_api
+from jobs import jobs_api, init_jobs
+from herd_maintenance import maintenance_api, start_nightly_maintenance
+from metrics import metrics_api, init_metrics
+from json_provider import init_json
+from herd_cache import herd
+from compression import init_compression
 
 app = Flask(__name__)
-CORS(app)
+init_json(app)
+init_compression(app)
+CORS(app, expose_headers=["X-Next-Cursor"])
 
 # Routes
 app.register_blueprint(cow_api)
@@ -33,6 +43,15 @@ app.register_blueprint(employees_api)
 app.register_blueprint(duties_api)
 app.register_blueprint(performance_api)
 app.register_blueprint(feeding_bp)
+app.register_blueprint(export_api)
+app.register_blueprint(dashboard_api)
+app.register_blueprint(maintenance_api)
+app.register_blueprint(jobs_api)
+app.register_blueprint(metrics_api)
+init_metrics(app)
+init_jobs(app)
+start_nightly_maintenance()
+herd.wait_ready()  # the one blocking wait for the first herd snapshot
 @app.route("/")
 def index():
     return jsonify({"message": "Dairy Farm Flask API running"}), 200
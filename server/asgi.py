@@ -0,0 +1,17 @@
+# server/asgi.py
+# ASGI entry point, for serving many slow requests concurrently from one process:
+#   DAIRY_DB_BACKEND=firestore uvicorn asgi:asgi_app --host 0.0.0.0 --port 5000
+# The Flask app runs on a large thread pool (ASGI_WORKERS) behind the event loop,
+# so hundreds of requests blocked on Firestore don't starve each other.
+# This is thread offload, not asyncio: views and the data layer (shared with the
+# local backend) stay synchronous, and independent reads inside a request run
+# concurrently through fanout.run_concurrently.
+# Needs a2wsgi and uvicorn (requirements.txt).
+# `python app.py` still runs the plain WSGI development server.
+import os
+from a2wsgi import WSGIMiddleware
+from app import app
+
+ASGI_WORKERS = int(os.environ.get("ASGI_WORKERS", "256"))
+
+asgi_app = WSGIMiddleware(app, workers=ASGI_WORKERS)
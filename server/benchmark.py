@@ -0,0 +1,250 @@
+# server/benchmark.py
+# Reproducible benchmarks for the API hot paths against a seeded synthetic farm.
+# Runs fully offline on the local backend and writes timings to JSON, so runs
+# from different commits can be compared.
+#
+#   python benchmark.py --herd-size 500 --years 2 --out bench.json
+#   python benchmark.py --compare bench.json --out bench_new.json
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DAIRY_DB_BACKEND", "local")
+
+CATEGORIES = [("cow", 0.55), ("heifer", 0.15), ("calf", 0.2), ("bull", 0.05), ("steer", 0.05)]
+BREEDS = ["Friesian", "Ayrshire", "Jersey", "Guernsey"]
+LOCATIONS = ["Barn A", "Barn B", "Paddock 1", "Paddock 2"]
+DIAGNOSES = ["healthy", "mild cough", "mastitis", "foot rot", "ketosis", "lameness", "pneumonia"]
+VACCINES = ["FMD", "Anthrax", "Brucellosis", "LSD", "Blackleg"]
+
+
+# --- Seeding
+def seed_farm(herd_size, years, seed=42, today=None):
+    from db_helpers import commit_in_batches
+    from firebase_config import db
+    from cow_routes import compute_age_months, map_category_to_type
+    from health_routes import is_flagged
+    from breeding_routes import calculate_dates
+    from milk_rollups import rebuild_rollups
+
+    rng = random.Random(seed)
+    today = today or datetime.utcnow()
+    days = int(365 * years)
+    writes = []
+    cows = []
+
+    for i in range(herd_size):
+        category = rng.choices([c for c, _ in CATEGORIES], [w for _, w in CATEGORIES])[0]
+        age_days = rng.randint(0, 300) if category == "calf" else rng.randint(300, 3000)
+        dob = (today - timedelta(days=age_days)).strftime("%Y-%m-%d")
+        status = rng.choice(["milking", "milking", "dry", "sick"]) if category == "cow" else "active"
+        milk_avg = rng.uniform(8, 30) if category == "cow" and status != "dry" else 0
+        tag_id = f"T{i:05d}"
+        cow = {
+            "tag_id": tag_id, "name": f"Cow {i}", "dob": dob, "age_months": compute_age_months(dob),
+            "breed": rng.choice(BREEDS), "gender": "male" if category in ("bull", "steer") else "female",
+            "category": category, "status": status,
+            "type": map_category_to_type(category, milk_avg, status),
+            "location": rng.choice(LOCATIONS),
+            "sire": f"T{rng.randint(0, herd_size - 1):05d}" if i > 10 else None,
+            "dam": f"T{rng.randint(0, herd_size - 1):05d}" if i > 10 else None,
+            "daily_milk_avg": round(milk_avg, 1), "sick_flag": status == "sick", "dead_flag": False,
+            "createdAt": today,
+        }
+        cows.append(cow)
+        writes.append(("set", db.collection("cows").document(tag_id), cow))
+
+    milkers = [c for c in cows if c["type"] == "milker"]
+    for day in range(days):
+        date = (today - timedelta(days=day)).strftime("%Y-%m-%d")
+        for cow in milkers:
+            base = cow["daily_milk_avg"]
+            morning, noon, evening = (round(max(rng.gauss(base / 3, 1.5), 0), 1) for _ in range(3))
+            writes.append(("set", db.collection("milk_records").document(f"{cow['tag_id']}_{date}"), {
+                "cow_id": cow["tag_id"], "date": date, "morning": morning, "noon": noon,
+                "evening": evening, "milker": "bench", "daily_total": morning + noon + evening,
+            }))
+
+    females = [c for c in cows if c["gender"] == "female" and c["category"] != "calf"]
+    for n in range(max(1, int(len(females) * years * 1.2))):
+        cow = rng.choice(females)
+        method = rng.choice(["AI", "natural"])
+        bred = (today - timedelta(days=rng.randint(0, days))).strftime("%Y-%m-%d")
+        expected, repeat = calculate_dates(bred, method)
+        writes.append(("set", db.collection("breeding").document(f"B{n:06d}"), {
+            "id": f"B{n:06d}", "cow": cow["tag_id"], "cowname": cow["name"], "method": method,
+            "breedingDate": bred, "expectedBirth": expected, "repeatDate": repeat, "createdAt": today,
+        }))
+
+    for n in range(int(herd_size * years * 4)):
+        cow = rng.choice(cows)
+        diagnosis = rng.choice(DIAGNOSES)
+        writes.append(("set", db.collection("healthchecks").document(f"H{n:06d}"), {
+            "id": f"H{n:06d}", "cow": cow["tag_id"], "cowname": cow["name"],
+            "date": (today - timedelta(days=rng.randint(0, days))).strftime("%Y-%m-%d"),
+            "temperature": round(rng.uniform(37.5, 40.5), 1), "diagnosis": diagnosis,
+            "flagged": is_flagged(diagnosis), "createdAt": today,
+        }))
+
+    for n in range(int(herd_size * years * 2)):
+        cow = rng.choice(cows)
+        given = today - timedelta(days=rng.randint(0, days))
+        writes.append(("set", db.collection("vaccinations").document(f"V{n:06d}"), {
+            "id": f"V{n:06d}", "cow_id": cow["tag_id"], "vaccine": rng.choice(VACCINES),
+            "date_given": given.strftime("%Y-%m-%d"),
+            "next_booster": (given + timedelta(days=rng.choice([30, 180, 365]))).strftime("%Y-%m-%d"),
+            "createdAt": today,
+        }))
+
+    commit_in_batches(writes)
+    rebuild_rollups()
+    return {"documents": len(writes), "cows": len(cows), "milkers": len(milkers)}
+
+
+# --- Timing
+def timed(fn, repeat, warmup=1, setup=None):
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "runs": repeat,
+        "mean_ms": round(statistics.mean(samples), 4),
+        "median_ms": round(statistics.median(samples), 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        "min_ms": round(samples[0], 4),
+    }
+
+
+def run_benchmarks(repeat):
+    from app import app
+    from cache import result_cache
+    from cow_routes import compute_age_months, map_category_to_type
+    from feeding_routes import calculate_feeding
+    from diagnosis_matcher import reflag_healthchecks
+    from health_routes import is_flagged
+
+    client = app.test_client()
+
+    def get(url):
+        def call():
+            resp = client.get(url)
+            assert resp.status_code in (200, 304), (url, resp.status_code)
+        return call
+
+    def post(url):
+        def call():
+            resp = client.post(url)
+            assert resp.status_code < 300, (url, resp.status_code)
+        return call
+
+    today = datetime.utcnow().strftime("%Y-%m-%d")
+    endpoints = {
+        "GET /api/milk-summary?range=day": get(f"/api/milk-summary?date={today}&range=day"),
+        "GET /api/milk-summary?range=week": get(f"/api/milk-summary?date={today}&range=week"),
+        "GET /api/milk-summary?range=month": get(f"/api/milk-summary?date={today}&range=month"),
+        "GET /api/milk-summary?range=month_series": get(f"/api/milk-summary?date={today}&range=month_series&months=24"),
+        "GET /api/vaccination-alerts": get("/api/vaccination-alerts"),
+        "GET /api/cows": get("/api/cows"),
+        "GET /stock_summary": get("/stock_summary"),
+        "POST /generate_and_save": post("/generate_and_save"),
+    }
+    results = {name: timed(fn, repeat) for name, fn in endpoints.items()}
+    results["GET /api/breeding-alerts (cold)"] = timed(get("/api/breeding-alerts"), repeat, setup=result_cache.clear)
+    results["GET /api/breeding-alerts (cached)"] = timed(get("/api/breeding-alerts"), repeat)
+    results["reflag_healthchecks"] = timed(reflag_healthchecks, max(1, repeat // 5))
+
+    cow = {"type": "milker", "name": "Bench", "dob": "2020-03-14"}
+    calf = {"type": "calf", "name": "Calf", "dob": datetime.utcnow().strftime("%Y-%m-%d")}
+    milk = {"daily_total": 21.5}
+    diagnosis = "Suspected clinical mastitis with mild fever"
+    pure = {
+        "calculate_feeding(milker)": lambda: calculate_feeding(cow, milk),
+        "calculate_feeding(calf)": lambda: calculate_feeding(calf),
+        "is_flagged": lambda: is_flagged(diagnosis),
+        "compute_age_months": lambda: compute_age_months("2020-03-14"),
+        "map_category_to_type": lambda: map_category_to_type("cow", 12, "milking"),
+    }
+    for name, fn in pure.items():
+        # time 1000 calls per sample so per-call cost is measurable
+        results[f"{name} x1000"] = timed(lambda fn=fn: [fn() for _ in range(1000)], repeat)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(baseline, current):
+    print(f"{'benchmark':50} {'base ms':>10} {'now ms':>10} {'change':>8}")
+    for name, now in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            print(f"{name:50} {'-':>10} {now['median_ms']:>10.3f} {'new':>8}")
+            continue
+        change = (now["median_ms"] - base["median_ms"]) / base["median_ms"] * 100 if base["median_ms"] else 0
+        print(f"{name:50} {base['median_ms']:>10.3f} {now['median_ms']:>10.3f} {change:>+7.1f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the dairy farm API on a synthetic farm")
+    parser.add_argument("--herd-size", type=int, default=200)
+    parser.add_argument("--years", type=float, default=1.0)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    from firebase_config import BACKEND
+    seed_start = time.perf_counter()
+    seeded = seed_farm(args.herd_size, args.years, args.seed)
+    seed_seconds = time.perf_counter() - seed_start
+
+    report = {
+        "meta": {
+            "commit": git_revision(),
+            "backend": BACKEND,
+            "herd_size": args.herd_size,
+            "years": args.years,
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "seeded": seeded,
+            "seed_seconds": round(seed_seconds, 2),
+            "python": platform.python_version(),
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+        },
+        "results": run_benchmarks(args.repeat),
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Wrote {len(report['results'])} results to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,11 @@
 from flask import Blueprint, request, jsonify
 from firebase_config import db
+from db_helpers import page_query, paged_response
+from herd_cache import get_cow, get_cows
+from fanout import run_concurrently
+from pedigree import pedigree, mating_from_reads, recommend_bulls, INBREEDING_WARNING
+from breedingalerts_routes import ALERT_WINDOW_DAYS
+from versions import conditional
 from datetime import datetime, timedelta
 import uuid
 
@@ -14,12 +20,15 @@ def calculate_dates(breeding_date_str, method="natural"):
         repeat_date = breeding_date + timedelta(days=21)
     return expected_birth.strftime("%Y-%m-%d"), repeat_date.strftime("%Y-%m-%d") if repeat_date else ""
 
-# ✅ Check inbreeding: cow and bull should not share sire or dam
-def check_inbreeding(cow, bull):
+# ✅ Expected inbreeding (Wright's F) of a cow x bull calf, over the whole pedigree.
+# Each side is a herd id, or (sire, dam) for animals outside the herd (AI sires).
+# Until the herd has loaded, the recent generations are read directly instead.
+def offspring_inbreeding(cow, bull):
     if not cow or not bull:
-        return False
-    return (cow.get("sire") and bull.get("sire") and cow["sire"] == bull["sire"]) or \
-           (cow.get("dam") and bull.get("dam") and cow["dam"] == bull["dam"])
+        return 0.0
+    if not pedigree.build():
+        return mating_from_reads(cow, bull)
+    return pedigree.mating(cow, bull)
 
 # ✅ Create breeding record
 @breeding_api.route("/api/breeding", methods=["POST"])
@@ -28,15 +37,26 @@ def add_breeding():
         data = request.json
         rec_id = str(uuid.uuid4())
 
-        # Fetch cow & bull details from cows collection if IDs provided
-        cow_doc = db.collection("cows").document(data.get("cow")).get()
-        cow_data = cow_doc.to_dict() if cow_doc.exists else {}
-
-        bull_doc = None
-        bull_data = {}
-        if data.get("bull") and data.get("method") != "AI":
-            bull_doc = db.collection("cows").document(data.get("bull")).get()
-            bull_data = bull_doc.to_dict() if bull_doc.exists else {}
+        cow_id = data.get("cow")
+        bull_id = data.get("bull") if data.get("bull") and data.get("method") != "AI" else None
+        # Bulls outside the herd (AI sires) come with their recorded parents
+        given_parents = (data.get("bullSire") or None, data.get("bullDam") or None)
+        bull_side = bull_id or given_parents
+        checked = cow_id and (bull_id or any(given_parents))
+
+        # Cow & bull details (in-memory herd, one round-trip on a miss) and the
+        # inbreeding check (direct pedigree reads until the herd has loaded) are
+        # independent: run them concurrently
+        found, coefficient = run_concurrently(
+            lambda: get_cows([cow_id, bull_id]),
+            lambda: offspring_inbreeding(cow_id, bull_side) if checked else None,
+        )
+        if bull_id and bull_id not in found:
+            # not a herd bull after all: fall back to the parents given with the request
+            checked = cow_id and any(given_parents)
+            coefficient = offspring_inbreeding(cow_id, given_parents) if checked else None
+        cow_data = found.get(data.get("cow"), {})
+        bull_data = found.get(bull_id, {}) if bull_id else {}
 
         expected_birth, repeat_date = calculate_dates(
             data.get("breedingDate"),
@@ -61,9 +81,10 @@ def add_breeding():
             "createdAt": datetime.utcnow(),
         }
 
-        # Inbreeding check
-        if check_inbreeding(cow_data, {"sire": record["bullSire"], "dam": record["bullDam"]}):
-            record["inbreedingWarning"] = True
+        if coefficient is not None:
+            record["inbreedingCoefficient"] = round(coefficient, 6)
+            if coefficient >= INBREEDING_WARNING:
+                record["inbreedingWarning"] = True
 
         db.collection("breeding").document(rec_id).set(record)
         return jsonify({"message": "Breeding record added", "record": record}), 201
@@ -72,25 +93,32 @@ def add_breeding():
 
 # ✅ Get all breeding records
 @breeding_api.route("/api/breeding", methods=["GET"])
+@conditional("breeding", daily=True)
 def get_breeding():
     try:
-        recs_ref = db.collection("breeding").stream()
+        today = datetime.utcnow().strftime("%Y-%m-%d")
+        alert_end = (datetime.utcnow() + timedelta(days=ALERT_WINDOW_DAYS)).strftime("%Y-%m-%d")
+
+        # ?due=true -> only records calving in the alert window (indexed range query)
+        query = None
+        order_by = "__name__"
+        if request.args.get("due", "").lower() in ("1", "true", "yes"):
+            query = db.collection("breeding").where("expectedBirth", ">=", today).where("expectedBirth", "<=", alert_end)
+            order_by = "expectedBirth"
+        recs_ref, next_cursor = page_query("breeding", request.args, query=query, order_by=order_by)
         records = []
-        today = datetime.utcnow()
         for doc in recs_ref:
             rec = doc.to_dict()
             rec["id"] = rec.get("id", doc.id)
 
-            # Alert if expected birth is within 7 days
-            if rec.get("expectedBirth"):
-                expected = datetime.strptime(rec["expectedBirth"], "%Y-%m-%d")
-                delta = (expected - today).days
-                rec["deliveryAlert"] = delta <= 7 and delta >= 0
-            else:
-                rec["deliveryAlert"] = False
+            # Alert if expected birth is within 7 days (ISO dates compare as strings)
+            expected = rec.get("expectedBirth") or ""
+            rec["deliveryAlert"] = today <= expected <= alert_end
 
             records.append(rec)
-        return jsonify(records), 200
+        return paged_response(records, next_cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -125,6 +153,25 @@ def update_breeding(rec_id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# ✅ Rank herd bulls for a cow by expected offspring inbreeding
+# GET /api/breeding/recommend/<cow_id>?limit=10
+@breeding_api.route("/api/breeding/recommend/<cow_id>", methods=["GET"])
+@conditional("cows")
+def recommend_mates(cow_id):
+    try:
+        if not pedigree.build():
+            return jsonify({"error": "Herd is still loading"}), 503
+        if get_cow(cow_id) is None:
+            return jsonify({"error": "Cow not found"}), 404
+        limit = request.args.get("limit", type=int)
+        return jsonify({
+            "cow": cow_id,
+            "cowInbreeding": round(pedigree.inbreeding(cow_id), 6),
+            "candidates": recommend_bulls(cow_id, limit),
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 # ✅ Delete breeding record
 @breeding_api.route("/api/breeding/<rec_id>", methods=["DELETE"])
 def delete_breeding(rec_id):
@@ -1,46 +1,83 @@
 from flask import Blueprint, jsonify
 from firebase_config import db
+from cache import result_cache, next_utc_midnight
+from fanout import run_concurrently
+from versions import conditional, versions
 from datetime import datetime, timedelta
 
 alerts_api = Blueprint("alerts_api", __name__)
 
+ALERT_WINDOW_DAYS = 7
+
+
+# --- Util: Breeding records whose `field` (an ISO YYYY-MM-DD string) falls in
+# [start, end]. ISO dates sort lexicographically, so this is an indexed range query.
+def breeding_due_between(field, start, end):
+    return (db.collection("breeding")
+            .where(field, ">=", start)
+            .where(field, "<=", end)
+            .order_by(field)
+            .stream())
+
+
+def compute_breeding_alerts(today):
+    start = today.strftime("%Y-%m-%d")
+    end = (today + timedelta(days=ALERT_WINDOW_DAYS)).strftime("%Y-%m-%d")
+    alerts = []
+
+    # Both range queries are independent: run them concurrently
+    births, repeats = run_concurrently(
+        lambda: list(breeding_due_between("expectedBirth", start, end)),
+        lambda: list(breeding_due_between("repeatDate", start, end)),
+    )
+
+    # Birth alert: 7 days before expected birth
+    for doc in births:
+        record = doc.to_dict()
+        cowname = record.get("cowname") or record.get("cow")
+        expected_birth = datetime.strptime(record["expectedBirth"], "%Y-%m-%d").date()
+        alerts.append({
+            "cow_id": record["cow"],
+            "cowname": cowname,
+            "type": "birth",
+            "message": f"Cow {cowname} is expected to calve on {record['expectedBirth']}.",
+            "days_remaining": (expected_birth - today).days
+        })
+
+    # Repeat AI alert
+    for doc in repeats:
+        record = doc.to_dict()
+        cowname = record.get("cowname") or record.get("cow")
+        repeat_date = datetime.strptime(record["repeatDate"], "%Y-%m-%d").date()
+        alerts.append({
+            "cow_id": record["cow"],
+            "cowname": cowname,
+            "type": "repeat",
+            "message": f"Cow {cowname} is due for repeat breeding on {record['repeatDate']}.",
+            "days_remaining": (repeat_date - today).days
+        })
+
+    return alerts
+
+
+# --- Cached for the rest of the UTC day, keyed by the breeding collection version:
+# a breeding write from any process (routes, cascades, propagated names) moves the
+# version, so every worker recomputes, and a compute that finishes after a write
+# lands under the old, unused key. Entries of older versions expire at midnight.
+def get_cached_breeding_alerts():
+    today = datetime.utcnow().date()
+    key = ("breeding_alerts", today.isoformat(), versions.get("breeding"))
+    alerts = result_cache.get(key)
+    if alerts is None:
+        alerts = compute_breeding_alerts(today)
+        result_cache.set(key, alerts, expires_at=next_utc_midnight())
+    return alerts
+
+
 @alerts_api.route("/api/breeding-alerts", methods=["GET"])
+@conditional("breeding", daily=True)
 def get_breeding_alerts():
     try:
-        today = datetime.utcnow().date()
-        alerts = []
-
-        breeding_ref = db.collection("breeding").stream()
-        for doc in breeding_ref:
-            record = doc.to_dict()
-            cowname = record.get("cowname") or record.get("cow")
-
-            # Birth alert: 7 days before expected birth
-            if record.get("expectedBirth"):
-                expected_birth = datetime.strptime(record["expectedBirth"], "%Y-%m-%d").date()
-                days_remaining = (expected_birth - today).days
-                if 0 <= days_remaining <= 7:
-                    alerts.append({
-                        "cow_id": record["cow"],
-                        "cowname": cowname,
-                        "type": "birth",
-                        "message": f"Cow {cowname} is expected to calve on {record['expectedBirth']}.",
-                        "days_remaining": days_remaining
-                    })
-
-            # Repeat AI alert
-            if record.get("repeatDate"):
-                repeat_date = datetime.strptime(record["repeatDate"], "%Y-%m-%d").date()
-                days_remaining = (repeat_date - today).days
-                if 0 <= days_remaining <= 7:
-                    alerts.append({
-                        "cow_id": record["cow"],
-                        "cowname": cowname,
-                        "type": "repeat",
-                        "message": f"Cow {cowname} is due for repeat breeding on {record['repeatDate']}.",
-                        "days_remaining": days_remaining
-                    })
-
-        return jsonify(alerts), 200
+        return jsonify(get_cached_breeding_alerts()), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
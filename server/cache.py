@@ -0,0 +1,56 @@
+# server/cache.py
+# Small process-wide result cache. Entries live until they expire or until a
+# write to the underlying data invalidates their group, e.g.
+#   result_cache.set(("breeding_alerts", today), alerts, expires_at=midnight)
+#   result_cache.invalidate("breeding_alerts")   # after a breeding write
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+
+class ResultCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    # Keys are tuples whose first element is the invalidation group
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and time.time() >= expires:
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl=None, expires_at=None):
+        if expires_at is not None:
+            expires = expires_at.timestamp()
+        elif ttl is not None:
+            expires = time.time() + ttl
+        else:
+            expires = None
+        with self._lock:
+            self._entries[key] = (value, expires)
+        return value
+
+    def invalidate(self, *groups):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] in groups]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+result_cache = ResultCache()
+
+
+# --- Util: Next UTC midnight, for results that are only valid for "today"
+def next_utc_midnight(now=None):
+    now = now or datetime.utcnow()
+    tomorrow = (now + timedelta(days=1)).date()
+    return datetime(tomorrow.year, tomorrow.month, tomorrow.day, tzinfo=timezone.utc)
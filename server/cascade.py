@@ -0,0 +1,123 @@
+# server/cascade.py
+# Cascading deletes. FOREIGN_KEYS says which child collections point at a
+# parent, and through which field; dependents are found with single-field
+# equality queries (automatically indexed) and removed page by page in
+# batched writes, children of children first.
+#   remove_document("cows", cow_id, mode)          the parent itself, right away
+#   cascade_dependents("cows", cow_id, mode, job)  everything pointing at it
+# The routes remove the parent inline and queue the dependents as a background
+# job (POST /api/jobs/cascade_delete {"collection", "id", "mode"} does the
+# same for parents that are already gone, e.g. to clean up old orphans).
+# Modes:
+#   delete     documents are deleted
+#   tombstone  deleted, leaving {collection, id, cause, deletedAt} in `tombstones`
+#   archive    copied to archive_<collection> (same id) before being deleted
+# Deleted unread notifications are taken off the unread counter.
+# Milk rollups are aggregates, not dependents: historical totals keep the milk.
+from datetime import datetime
+from firebase_config import db
+from db_helpers import BATCH_LIMIT, commit_in_batches
+from notification_feed import unread_counter_ref, unread_increment
+from jobs import job_kind, runner
+
+# parent collection -> [(child collection, field holding the parent id)]
+FOREIGN_KEYS = {
+    "cows": [
+        ("milk_records", "cow_id"),
+        ("breeding", "cow"),
+        ("healthchecks", "cow"),
+        ("treatments", "cow_id"),   # entered through the treatments form
+        ("treatments", "cow"),      # auto-created from a flagged health check
+        ("vaccinations", "cow_id"),
+        ("feeding_records", "cow_id"),
+        ("notifications", "cow_id"),
+    ],
+    "healthchecks": [
+        ("treatments", "healthcheck_id"),
+    ],
+}
+
+DELETE, TOMBSTONE, ARCHIVE = "delete", "tombstone", "archive"
+MODES = (DELETE, TOMBSTONE, ARCHIVE)
+
+TOMBSTONES = "tombstones"
+ARCHIVE_PREFIX = "archive_"
+
+# Fields a removal needs when the document isn't archived
+REMOVAL_FIELDS = {"notifications": ["read"]}
+
+
+def _removal_writes(collection, docs, mode, cause):
+    now = datetime.utcnow()
+    unread = 0
+    for doc in docs:
+        data = doc.to_dict() or {}
+        if mode == ARCHIVE:
+            yield ("set", db.collection(ARCHIVE_PREFIX + collection).document(doc.id),
+                   {**data, "archivedAt": now, "cause": cause})
+        elif mode == TOMBSTONE:
+            yield ("set", db.collection(TOMBSTONES).document(f"{collection}_{doc.id}"),
+                   {"collection": collection, "id": doc.id, "cause": cause, "deletedAt": now})
+        yield ("delete", db.collection(collection).document(doc.id))
+        if collection == "notifications" and data.get("read") is False:
+            unread += 1
+    if unread:
+        yield ("set_merge", unread_counter_ref(), unread_increment(-unread))
+
+
+def _page_query(query, mode, collection):
+    if mode != ARCHIVE:
+        query = query.select(REMOVAL_FIELDS.get(collection, []))
+    return query.limit(BATCH_LIMIT)
+
+
+# --- Remove one document (the parent); False if it doesn't exist
+def remove_document(collection, doc_id, mode=DELETE):
+    snap = db.collection(collection).document(doc_id).get()
+    if not snap.exists:
+        return False
+    commit_in_batches(_removal_writes(collection, [snap], mode, f"{collection}/{doc_id}"))
+    return True
+
+
+# --- Remove everything that points at collection/doc_id, recursively
+def cascade_dependents(collection, doc_id, mode=DELETE, job=None, cause=None, report=None):
+    cause = cause or f"{collection}/{doc_id}"
+    report = report if report is not None else {"mode": mode, "removed": {}, "commits": 0}
+    for child, field in FOREIGN_KEYS.get(collection, ()):
+        query = _page_query(db.collection(child).where(field, "==", doc_id), mode, child)
+        while True:
+            if job is not None:
+                job.check_cancelled()
+            page = list(query.stream())
+            if not page:
+                break
+            for doc in page:
+                if child in FOREIGN_KEYS:
+                    cascade_dependents(child, doc.id, mode, job, cause, report)
+            report["commits"] += commit_in_batches(_removal_writes(child, page, mode, cause))
+            report["removed"][child] = report["removed"].get(child, 0) + len(page)
+            if job is not None:
+                job.progress(sum(report["removed"].values()), message=f"{cause}: {report['removed']}")
+            if len(page) < BATCH_LIMIT:
+                break
+    return report
+
+
+def _validate_cascade(params):
+    if params.get("collection") not in FOREIGN_KEYS:
+        raise ValueError(f"No cascade defined for collection: {params.get('collection')}")
+    if not params.get("id"):
+        raise ValueError("id is required")
+    if params.get("mode", DELETE) not in MODES:
+        raise ValueError(f"mode must be {'|'.join(MODES)}")
+
+
+@job_kind("cascade_delete", max_concurrent=2, validate=_validate_cascade)
+def _cascade_job(job, **params):
+    return cascade_dependents(params["collection"], params["id"], params.get("mode", DELETE), job)
+
+
+# --- Util: Queue the dependents of collection/doc_id for removal; returns the job id
+def queue_cascade(collection, doc_id, mode=DELETE):
+    return runner.submit("cascade_delete", {"collection": collection, "id": doc_id, "mode": mode})
@@ -0,0 +1,53 @@
+# server/compression.py
+# Compresses buffered text/JSON responses, negotiated via Accept-Encoding.
+# Brotli is used when the `brotli` package is installed and the client accepts
+# it, gzip otherwise. Streamed responses (SSE, exports) and small bodies are
+# left alone. Compressed responses carry a weak ETag, as the bytes differ from
+# the uncompressed variant.
+import gzip
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_SIZE = 1024
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+COMPRESSIBLE = ("application/json", "text/", "application/x-ndjson")
+
+
+def _choose_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+
+def init_compression(app):
+    @app.after_request
+    def _compress(response):
+        response.vary.add("Accept-Encoding")
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or "Content-Encoding" in response.headers
+                or not (response.mimetype or "").startswith(COMPRESSIBLE)):
+            return response
+        body = response.get_data()
+        if len(body) < MIN_SIZE:
+            return response
+        encoding = _choose_encoding()
+        if encoding is None:
+            return response
+
+        if encoding == "br":
+            response.set_data(brotli.compress(body, quality=BROTLI_QUALITY))
+        else:
+            response.set_data(gzip.compress(body, compresslevel=GZIP_LEVEL))
+        response.headers["Content-Encoding"] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
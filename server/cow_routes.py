@@ -1,7 +1,14 @@
 # server/cow_routes.py
 from flask import Blueprint, request, jsonify
 from firebase_config import db, bucket
+from db_helpers import page_query, paged_response, parse_fields, MAX_PAGE_SIZE
+from herd_cache import herd, INDEXED_FIELDS
+from cow_search import search_index
+from cascade import remove_document, queue_cascade, MODES, DELETE
+from propagation import queue_propagation
+from versions import conditional
 from datetime import datetime
+import bisect
 import uuid
 
 cow_api = Blueprint("cow_api", __name__)
@@ -74,13 +81,161 @@ def register_cow():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# --- Util: Herd list filters
+#   ?category=&status=&type=&location=&breed=   equality
+#   ?sick=true|false&dead=true|false            sick_flag / dead_flag
+#   ?age_min=&age_max=                          age_months range (inclusive)
+# Returns [(field, op, value)]; raises ValueError for malformed values.
+# Equality filters combine freely (Firestore merges single-field indexes). An
+# age range needs a composite index over the equality fields plus age_months,
+# so it is only accepted with the equality sets in COW_AGE_INDEXES (400
+# otherwise), on both the herd-cache and Firestore paths. Keep it in step with
+# ../firestore.indexes.json (firebase deploy --only firestore:indexes).
+COW_EQUALITY_FILTERS = {"category": "category", "status": "status", "type": "type",
+                        "location": "location", "breed": "breed"}
+COW_FLAG_FILTERS = {"sick": "sick_flag", "dead": "dead_flag"}
+COW_RANGE_FILTERS = {"age_min": ("age_months", ">="), "age_max": ("age_months", "<=")}
+COW_AGE_INDEXES = {frozenset(fields) for fields in [
+    (),
+    ("category",), ("status",), ("type",), ("location",), ("breed",), ("sick_flag",), ("dead_flag",),
+    ("category", "status"), ("category", "location"), ("type", "location"),
+    ("category", "dead_flag"), ("category", "sick_flag"), ("category", "breed"),
+]}
+
+
+def parse_cow_filters(args):
+    filters = []
+    for param, field in COW_EQUALITY_FILTERS.items():
+        if args.get(param):
+            filters.append((field, "==", args[param]))
+    for param, field in COW_FLAG_FILTERS.items():
+        value = (args.get(param) or "").lower()
+        if value:
+            if value not in ("true", "false", "1", "0"):
+                raise ValueError(f"invalid {param}: expected true or false")
+            filters.append((field, "==", value in ("true", "1")))
+    for param, (field, op) in COW_RANGE_FILTERS.items():
+        if args.get(param):
+            try:
+                filters.append((field, op, int(args[param])))
+            except ValueError:
+                raise ValueError(f"invalid {param}: expected whole months")
+    equality = frozenset(field for field, op, _ in filters if op == "==")
+    if is_ranged(filters) and equality not in COW_AGE_INDEXES:
+        params = {field: param for param, field in {**COW_EQUALITY_FILTERS, **COW_FLAG_FILTERS}.items()}
+        raise ValueError(f"age_min/age_max can't be combined with {', '.join(sorted(params[f] for f in equality))} "
+                         "(no index); drop a filter or filter by age client-side")
+    return filters
+
+
+def is_ranged(filters):
+    return any(op != "==" for _, op, _ in filters)
+
+
+def _passes(cow, field, op, value):
+    actual = cow.get(field)
+    if op == "==":
+        return actual == value
+    if actual is None:
+        return False
+    return actual >= value if op == ">=" else actual <= value
+
+
+# --- Util: Cow list straight from Firestore, with the filters as where clauses.
+# A range on age_months must be the first ordering, so pages follow age then id.
+def firestore_cow_page(args):
+    filters = parse_cow_filters(args)
+    query = db.collection("cows")
+    for field, op, value in filters:
+        query = query.where(field, op, value)
+    docs, next_cursor = page_query("cows", args, query=query,
+                                   order_by="age_months" if is_ranged(filters) else "__name__")
+    return [{**doc.to_dict(), "id": doc.id} for doc in docs], next_cursor
+
+
+# --- Util: Serve a cow list page straight from the in-memory herd.
+# Same ?limit=&cursor=&fields= and filter contract and page order as
+# firestore_cow_page, so a cursor stays valid when one path takes over from the
+# other. Callers are @conditional("cows"), which tags the response from the
+# persisted cows version and the request URL.
+def herd_list_response(args):
+    filters = parse_cow_filters(args)
+    ids = herd_filtered_ids(filters)
+    if is_ranged(filters):
+        # age_months, then id (every matched cow has an age)
+        ages = {cid: cow["age_months"] for cid, cow in herd.get_many(ids).items()}
+        keys = sorted((ages[cid], cid) for cid in ids if cid in ages)
+        ids = [cid for _, cid in keys]
+        start = 0
+        if args.get("cursor"):
+            cursor_cow = herd.get(args["cursor"])
+            if cursor_cow is None:
+                raise ValueError("invalid cursor")
+            if cursor_cow.get("age_months") is not None:  # null ages sort first
+                start = bisect.bisect_right(keys, (cursor_cow["age_months"], args["cursor"]))
+    else:
+        start = bisect.bisect_right(ids, args["cursor"]) if args.get("cursor") else 0
+    limit = args.get("limit", type=int)
+    end = start + max(1, min(limit, MAX_PAGE_SIZE)) if limit else len(ids)
+    page_ids = ids[start:end]
+    fields = parse_fields(args)
+
+    cows = herd.get_many(page_ids)
+    cow_list = []
+    for cow_id in page_ids:
+        cow = cows.get(cow_id)
+        if cow is None:
+            continue
+        if fields is not None:
+            cow = {f: cow[f] for f in fields if f in cow}
+        cow_list.append({**cow, "id": cow_id})
+
+    next_cursor = page_ids[-1] if limit and end < len(ids) else None
+    return paged_response(cow_list, next_cursor)
+
+# Indexed equality filters narrow the candidates; the rest are checked per cow
+def herd_filtered_ids(filters):
+    ids = herd.ids()
+    if not filters:
+        return ids
+    candidates = None
+    for field, op, value in filters:
+        if op == "==" and field in INDEXED_FIELDS:
+            matched = herd.ids_by(field, value)
+            candidates = matched if candidates is None else candidates & matched
+    rest = [f for f in filters if not (f[1] == "==" and f[0] in INDEXED_FIELDS)]
+    pool = ids if candidates is None else sorted(candidates)
+    if not rest:
+        return pool
+    cows = herd.get_many(pool)
+    return [cid for cid in pool if cid in cows and all(_passes(cows[cid], *f) for f in rest)]
+
 # --- Route: Get all cows
 @cow_api.route("/api/cows", methods=["GET"])
+@conditional("cows")
 def get_all_cows():
     try:
-        cows_ref = db.collection("cows").stream()
-        cow_list = [{**doc.to_dict(), "id": doc.id} for doc in cows_ref]
-        return jsonify(cow_list), 200
+        if herd.ready():
+            return herd_list_response(request.args)
+        cow_list, next_cursor = firestore_cow_page(request.args)
+        return paged_response(cow_list, next_cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# --- Route: Type-ahead search over tag, name, sire and dam
+# GET /api/cows/search?q=bel&limit=10
+@cow_api.route("/api/cows/search", methods=["GET"])
+def search_cows():
+    try:
+        q = (request.args.get("q") or "").strip()
+        if not q:
+            return jsonify([]), 200
+        if not search_index.build():
+            return jsonify({"error": "Search index is still loading"}), 503
+        limit = max(1, min(request.args.get("limit", default=10, type=int), 50))
+        return jsonify(search_index.search(q, limit)), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -102,15 +257,24 @@ def update_cow(tag_id):
             data["dead_flag"] = status_lower == "dead"
 
         db.collection("cows").document(tag_id).update(data)
-        return jsonify({"message": "✅ Cow updated"}), 200
+        # breeding and health records copy name, dam and sire: refresh them in the background
+        job_id = queue_propagation("cows", tag_id, data)
+        return jsonify({"message": "✅ Cow updated", "propagationJob": job_id}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 # --- Route: Delete cow
+# The cow goes now; its records (milk, breeding, health, treatments,
+# vaccinations, feeding, notifications) are removed by a background job.
+# ?mode=delete|tombstone|archive (see cascade.py)
 @cow_api.route("/api/cows/<tag_id>", methods=["DELETE"])
 def delete_cow(tag_id):
+    mode = request.args.get("mode", DELETE)
+    if mode not in MODES:
+        return jsonify({"error": f"mode must be {'|'.join(MODES)}"}), 400
     try:
-        db.collection("cows").document(tag_id).delete()
-        return jsonify({"message": f"✅ Cow {tag_id} deleted"}), 200
+        remove_document("cows", tag_id, mode)
+        job_id = queue_cascade("cows", tag_id, mode)
+        return jsonify({"message": f"✅ Cow {tag_id} deleted", "cascadeJob": job_id}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -0,0 +1,184 @@
+# server/cow_search.py
+# In-memory type-ahead search over cow tag ids, names, sires and dams.
+# Built from the herd cache on first use and kept current through
+# herd.subscribe(), so cow writes re-index just that cow.
+#   - prefix matches: every token is kept in a sorted list, a prefix is a bisect range
+#   - typo-tolerant matches: when prefixes find too few cows, tokens sharing
+#     trigrams with the query term are checked with a bounded edit distance
+#     (1 typo from 4 chars, 2 from 8)
+# Every query term must match; results are ranked by match quality and field weight.
+import bisect
+import heapq
+import re
+import threading
+from herd_cache import herd
+
+# Field -> weight: a tag match outranks a name match, which outranks a parent match
+SEARCH_FIELDS = {"tag_id": 4.0, "name": 3.0, "sire": 1.0, "dam": 1.0}
+EXACT, PREFIX, FUZZY = 3.0, 2.0, 1.0
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+# Matching is prefix-based, so only the start of a token needs trigrams
+GRAM_PREFIX = 12
+# Typo search: trigrams on more tokens than this are too common to narrow anything,
+# and at most this many candidate tokens get an edit-distance check
+COMMON_GRAM = 512
+FUZZY_CANDIDATES = 64
+
+
+def _tokens(value):
+    text = str(value).lower().strip()
+    tokens = set(_TOKEN_RE.findall(text))
+    if text and not any(ch.isspace() for ch in text):
+        tokens.add(text)  # whole tag, so "ke-0012" also matches as typed
+    return tokens
+
+
+def _trigrams(token):
+    padded = f"^{token[:GRAM_PREFIX]}"
+    return {padded[i:i + 3] for i in range(max(len(padded) - 2, 1))}
+
+
+def _max_typos(term):
+    return 0 if len(term) < 4 else 1 if len(term) < 8 else 2
+
+
+# Edit distance between `term` and the closest prefix of `token` of similar length
+def _prefix_distance(term, token, limit):
+    previous = list(range(len(token) + 1))
+    for i, a in enumerate(term, 1):
+        current = [i]
+        for j, b in enumerate(token, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a != b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return min(previous[max(len(term) - limit, 0):])
+
+
+class CowSearchIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = {}   # token -> {cow_id: {field: weight}}
+        self._tokens = []     # sorted tokens, for prefix ranges
+        self._trigrams = {}   # trigram -> set(tokens)
+        self._by_cow = {}     # cow_id -> set(tokens)
+        self._docs = {}       # cow_id -> summary returned in results
+        self._built = False
+
+    # --- Maintenance
+    def build(self):
+        with self._lock:
+            if self._built:
+                return True
+            if not herd.ready():
+                return False
+            herd.subscribe(self._on_change)
+            for cow_id, cow in herd.items():
+                self._put(cow_id, cow)
+            self._built = True
+            return True
+
+    def _on_change(self, kind, cow_id, cow):
+        with self._lock:
+            if kind == "REMOVED" or cow is None:
+                self._remove(cow_id)
+            else:
+                self._put(cow_id, cow)
+
+    def _put(self, cow_id, cow):
+        self._remove(cow_id)
+        tokens = set()
+        for field, weight in SEARCH_FIELDS.items():
+            if not cow.get(field):
+                continue
+            for token in _tokens(cow[field]):
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = {}
+                    bisect.insort(self._tokens, token)
+                    for gram in _trigrams(token):
+                        self._trigrams.setdefault(gram, set()).add(token)
+                postings.setdefault(cow_id, {})[field] = weight
+                tokens.add(token)
+        self._by_cow[cow_id] = tokens
+        self._docs[cow_id] = {k: cow.get(k) for k in ("tag_id", "name", "sire", "dam", "category", "status")}
+
+    def _remove(self, cow_id):
+        for token in self._by_cow.pop(cow_id, ()):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(cow_id, None)
+            if not postings:
+                del self._postings[token]
+                del self._tokens[bisect.bisect_left(self._tokens, token)]
+                for gram in _trigrams(token):
+                    tokens = self._trigrams.get(gram)
+                    if tokens is not None:
+                        tokens.discard(token)
+                        if not tokens:
+                            del self._trigrams[gram]
+        self._docs.pop(cow_id, None)
+
+    # --- Lookup
+    # Prefix matches first; typo-tolerant matches only when prefixes find fewer than `limit` cows
+    def _term_scores(self, term, limit):
+        scores = {}
+
+        def credit(token, quality):
+            for cow_id, fields in self._postings[token].items():
+                best = quality * max(fields.values())
+                if best > scores.get(cow_id, 0):
+                    scores[cow_id] = best
+
+        start = bisect.bisect_left(self._tokens, term)
+        for token in self._tokens[start:]:
+            if not token.startswith(term):
+                break
+            credit(token, EXACT if token == term else PREFIX)
+
+        typos = _max_typos(term)
+        if typos and len(scores) < limit:
+            # Candidates come from the term's rarer trigrams (ones like "^ke" shared by
+            # every tag say little); the tokens sharing the most are checked first.
+            postings = sorted((self._trigrams.get(gram, ()) for gram in _trigrams(term)), key=len)
+            rare = [tokens for tokens in postings if len(tokens) <= COMMON_GRAM] or postings[:1]
+            shared = {}
+            for tokens in rare:
+                for token in tokens:
+                    shared[token] = shared.get(token, 0) + 1
+            candidates = heapq.nlargest(FUZZY_CANDIDATES, shared, key=shared.get)
+            distances = {}  # tokens with the same leading chars share one computation
+            for token in candidates:
+                if len(token) < len(term) - typos or token.startswith(term):
+                    continue
+                head = token[:len(term) + typos]
+                distance = distances.get(head)
+                if distance is None:
+                    distance = distances[head] = _prefix_distance(term, head, typos)
+                if distance <= typos:
+                    credit(token, FUZZY - 0.25 * (distance - 1))
+        return scores
+
+    def search(self, q, limit=10):
+        terms = sorted(set(q.lower().split()), key=len, reverse=True)
+        if not terms:
+            return []
+        with self._lock:
+            combined = None
+            for term in terms:
+                scores = self._term_scores(term, limit)
+                if combined is None:
+                    combined = scores
+                else:
+                    combined = {cid: combined[cid] + s for cid, s in scores.items() if cid in combined}
+                if not combined:
+                    return []
+            ranked = sorted(combined.items(), key=lambda item: (-item[1], item[0]))[:limit]
+            return [{**self._docs[cid], "id": cid, "score": round(score, 2)} for cid, score in ranked]
+
+
+search_index = CowSearchIndex()
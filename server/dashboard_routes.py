@@ -0,0 +1,104 @@
+# server/dashboard_routes.py
+# GET /api/dashboard: everything the dashboard's first paint needs in one call.
+#   - herd counts by type and status, sick and dead (from the herd cache)
+#   - breeding alerts: animals due to calve or repeat within 7 days
+#   - vaccination boosters due within 7 days
+#   - unread notification count (from the counter document)
+#   - today's and this month's milk totals (from the rollups)
+# Inputs are fetched concurrently and the result is cached for DASHBOARD_TTL
+# seconds; a successful write to any source collection drops it.
+import os
+from datetime import datetime
+from flask import Blueprint, jsonify
+from firebase_config import db, after_write
+from cache import result_cache
+from fanout import run_concurrently
+from herd_cache import herd
+from milk_rollups import get_rollups, month_key
+from notification_feed import read_unread_count
+from breedingalerts_routes import get_cached_breeding_alerts
+from vaccinations_routes import compute_booster_alerts
+from versions import conditional
+
+dashboard_api = Blueprint("dashboard_api", __name__)
+
+DASHBOARD_TTL = float(os.environ.get("DASHBOARD_TTL_SECONDS", "30"))
+
+DASHBOARD_SOURCES = {
+    "cows", "breeding", "vaccinations", "notifications", "counters",
+    "milk_records", "milk_rollups",
+}
+
+
+# --- Invalidate once a write to any source went through (other processes rely on the TTL)
+@after_write
+def _invalidate_dashboard(collections, batch=None):
+    if collections & DASHBOARD_SOURCES:
+        result_cache.invalidate("dashboard")
+
+
+# --- Util: Herd counts, from memory when the cache is live, else one projected scan
+def herd_counts():
+    if herd.ready():
+        cows = [cow for _, cow in herd.items()]
+    else:
+        cows = [doc.to_dict() for doc in
+                db.collection("cows").select(["type", "status", "sick_flag", "dead_flag"]).stream()]
+
+    by_type, by_status = {}, {}
+    sick = dead = 0
+    for cow in cows:
+        cow_type = cow.get("type") or "unknown"
+        status = cow.get("status") or "unknown"
+        by_type[cow_type] = by_type.get(cow_type, 0) + 1
+        by_status[status] = by_status.get(status, 0) + 1
+        sick += bool(cow.get("sick_flag"))
+        dead += bool(cow.get("dead_flag"))
+    return {"total": len(cows), "by_type": by_type, "by_status": by_status, "sick": sick, "dead": dead}
+
+
+def compute_dashboard(today):
+    date_str = today.strftime("%Y-%m-%d")
+    counts, alerts, boosters, unread, day, month = run_concurrently(
+        herd_counts,
+        get_cached_breeding_alerts,
+        lambda: compute_booster_alerts(today),
+        read_unread_count,
+        lambda: get_rollups("day", [date_str])[0],
+        lambda: get_rollups("month", [month_key(today)])[0],
+    )
+    return {
+        "date": date_str,
+        "herd": counts,
+        "breeding": {
+            "due_to_calve": [a for a in alerts if a["type"] == "birth"],
+            "due_for_repeat": [a for a in alerts if a["type"] == "repeat"],
+        },
+        "boosters_due": boosters,
+        "notifications": {"unread": unread},
+        "milk": {
+            "today": float(day.get("total", 0)),
+            "month": float(month.get("total", 0)),
+            "month_key": month_key(today),
+        },
+        "generatedAt": datetime.utcnow(),
+    }
+
+
+def get_cached_dashboard():
+    today = datetime.utcnow().date()
+    key = ("dashboard", today.isoformat())
+    dashboard = result_cache.get(key)
+    if dashboard is None:
+        dashboard = result_cache.set(key, compute_dashboard(today), ttl=DASHBOARD_TTL)
+    return dashboard
+
+
+# ✅ Dashboard aggregate
+@dashboard_api.route("/api/dashboard", methods=["GET"])
+@conditional("cows", "breeding", "vaccinations", "notifications", "milk_rollups", daily=True)
+def get_dashboard():
+    try:
+        return jsonify(get_cached_dashboard()), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
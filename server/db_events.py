@@ -0,0 +1,159 @@
+# server/db_events.py
+# Data-layer hooks on the client. firebase_config wraps the client with
+# observe_client(), which proxies it and everything it hands out (collections,
+# documents, queries, batches, transactions) and reports what goes through it:
+#   - @on_operations  fn(op, n): billed document operations ("reads", "writes",
+#     "deletes"); metrics.py counts these per request
+#   - @before_commit  fn(collections, batch): just before a batch or transaction
+#     commits, with the wrapped batch, so the hook's own writes land in the same
+#     atomic commit (a failed commit drops them too). Not called for single
+#     document writes.
+#   - @after_write    fn(collections, batch): only after a write succeeded. For
+#     batches and transactions, after the commit returns (batch = the committed
+#     wrapper); for single document writes, after the write returns (batch=None).
+#     A write or commit that raises notifies nobody.
+# collections is the set of collection ids the write touched.
+# Arguments are unwrapped before reaching the real client, so library code
+# (isinstance checks, firestore.transactional) only ever sees real objects.
+_operation_listeners = []
+_before_commit = []
+_after_write = []
+
+
+def on_operations(fn):
+    _operation_listeners.append(fn)
+    return fn
+
+
+def before_commit(fn):
+    _before_commit.append(fn)
+    return fn
+
+
+def after_write(fn):
+    _after_write.append(fn)
+    return fn
+
+
+def _count(op, n=1):
+    for fn in _operation_listeners:
+        fn(op, n)
+
+
+def _notify(observers, collections, batch=None):
+    for fn in observers:
+        fn(set(collections), batch)
+
+
+_READ_METHODS = {"get", "stream", "get_all"}
+_WRITE_METHODS = {"set", "update", "create", "add"}
+_WRAPPED_MARKERS = ("stream", "commit", "collection", "document", "set")
+_DOC_WRITE_METHODS = {"set", "update", "create", "delete"}
+_COMMIT_METHODS = {"commit", "_commit"}  # firestore.transactional calls _commit()
+
+
+def _unwrap(value):
+    if isinstance(value, Observed):
+        return value._target
+    if isinstance(value, (list, tuple)):
+        return type(value)(_unwrap(v) for v in value)
+    return value
+
+
+def _wrap(value):
+    if isinstance(value, tuple):
+        return tuple(_wrap(v) for v in value)
+    if value is None or isinstance(value, (str, int, float, bool, list, dict, Observed)):
+        return value
+    if hasattr(value, "to_dict") and hasattr(value, "exists"):
+        return value  # document snapshot
+    if any(hasattr(value, m) for m in _WRAPPED_MARKERS):
+        return Observed(value)
+    return value
+
+
+def _counted(iterable):
+    n = 0
+    try:
+        for item in iterable:
+            n += 1
+            yield item
+    finally:
+        _count("reads", max(n, 1))  # an empty query is still billed one read
+
+
+class Observed:
+    def __init__(self, target):
+        object.__setattr__(self, "_target", target)
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr) or name.startswith("__"):
+            return attr
+
+        def call(*args, **kwargs):
+            is_batch = hasattr(self._target, "commit")
+            if is_batch and name in _COMMIT_METHODS and self._touched:
+                return self._commit(attr, name, args, kwargs)
+            if is_batch and name in _DOC_WRITE_METHODS and args:
+                self._touched.add(_unwrap(args[0]).parent.id)
+            result = attr(*_unwrap(args), **{k: _unwrap(v) for k, v in kwargs.items()})
+            if not is_batch and name in _DOC_WRITE_METHODS and hasattr(self._target, "parent"):
+                _notify(_after_write, {self._target.parent.id})
+            elif name == "add":
+                _notify(_after_write, {self._target.id})
+            return self._account(name, args, result)
+        return call
+
+    # Batch/transaction commit: before_commit hooks may add writes, after_write
+    # hooks run once it went through. The touched set is reset either way (a
+    # retried transaction re-adds its writes).
+    def _commit(self, attr, name, args, kwargs):
+        touched = set(self._touched)
+        try:
+            _notify(_before_commit, touched, self)
+            result = attr(*_unwrap(args), **{k: _unwrap(v) for k, v in kwargs.items()})
+        finally:
+            self._touched.clear()
+        _notify(_after_write, touched, self)
+        return self._account(name, args, result)
+
+    @property
+    def _touched(self):
+        touched = self.__dict__.get("_touched_collections")
+        if touched is None:
+            touched = set()
+            object.__setattr__(self, "_touched_collections", touched)
+        return touched
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, value)
+
+    def __iter__(self):
+        return iter(self._target)
+
+    def __len__(self):
+        return len(self._target)
+
+    def __repr__(self):
+        return f"Observed({self._target!r})"
+
+    def _account(self, name, args, result):
+        if name in _READ_METHODS:
+            if hasattr(result, "exists"):
+                _count("reads")
+                return result
+            if isinstance(result, list):
+                _count("reads", max(len(result), 1))
+                return result
+            if hasattr(result, "__next__"):
+                return _counted(result)
+        elif name in _WRITE_METHODS:
+            _count("writes")
+        elif name == "delete":
+            _count("deletes")
+        return _wrap(result)
+
+
+def observe_client(client):
+    return Observed(client)
@@ -0,0 +1,104 @@
+# server/db_helpers.py
+# Shared batched read/write helpers so hot paths don't each reinvent them.
+# Works the same against Firestore and the local backend.
+from flask import jsonify
+from firebase_config import db, ASCENDING
+
+# Firestore caps a WriteBatch at 500 operations
+BATCH_LIMIT = 500
+
+# Largest page a list endpoint will return for ?limit=
+MAX_PAGE_SIZE = 1000
+
+
+# --- Util: Commit writes in chunks of BATCH_LIMIT.
+# Each write is a tuple: ("set", ref, data), ("set_merge", ref, data),
+# ("update", ref, data) or ("delete", ref). Returns the number of commits.
+# With a background job, a cancel stops it between commits.
+def commit_in_batches(writes, chunk_size=BATCH_LIMIT, job=None):
+    commits = 0
+    batch = db.batch()
+    pending = 0
+    for write in writes:
+        op, ref = write[0], write[1]
+        if op == "set":
+            batch.set(ref, write[2])
+        elif op == "set_merge":
+            batch.set(ref, write[2], merge=True)
+        elif op == "update":
+            batch.update(ref, write[2])
+        elif op == "delete":
+            batch.delete(ref)
+        else:
+            raise ValueError(f"Unknown batch operation: {op}")
+        pending += 1
+        if pending == chunk_size:
+            if job is not None:
+                job.check_cancelled()
+            batch.commit()
+            commits += 1
+            batch = db.batch()
+            pending = 0
+    if pending:
+        if job is not None:
+            job.check_cancelled()
+        batch.commit()
+        commits += 1
+    return commits
+
+
+# --- Util: Fetch many documents of one collection in a single round-trip.
+# Returns {doc_id: data} for the documents that exist.
+def get_docs(collection, doc_ids, fields=None):
+    refs = [db.collection(collection).document(doc_id) for doc_id in dict.fromkeys(doc_ids) if doc_id]
+    if not refs:
+        return {}
+    return {snap.id: snap.to_dict() for snap in db.get_all(refs, field_paths=fields) if snap.exists}
+
+
+# --- Util: Cursor pagination + field projection for list endpoints.
+#   ?limit=N      page size (capped at MAX_PAGE_SIZE); omitted -> whole result as before
+#   ?cursor=ID    id of the last document of the previous page
+#   ?fields=a,b   only fetch these fields (Firestore select())
+# Ordering always ends on the document id so pages are stable.
+# Returns (snapshots, next_cursor); raises ValueError for a bad cursor.
+def page_query(collection, args, query=None, order_by="__name__", direction=ASCENDING,
+               default_limit=None):
+    query = query if query is not None else db.collection(collection)
+    query = query.order_by(order_by, direction=direction)
+
+    fields = parse_fields(args)
+    if fields is not None:
+        query = query.select(fields)
+
+    limit = args.get("limit", type=int) or default_limit
+    if limit:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        query = query.limit(limit)
+
+    cursor = args.get("cursor")
+    if cursor:
+        cursor_snap = db.collection(collection).document(cursor).get()
+        if not cursor_snap.exists:
+            raise ValueError("invalid cursor")
+        query = query.start_after(cursor_snap)
+
+    docs = list(query.stream())
+    next_cursor = docs[-1].id if limit and len(docs) == limit else None
+    return docs, next_cursor
+
+
+# "id" is always returned (it comes from the document name), so it is not selected
+def parse_fields(args):
+    if not args.get("fields"):
+        return None
+    return [f.strip() for f in args["fields"].split(",") if f.strip() and f.strip() != "id"]
+
+
+# --- Util: JSON list response with the next page cursor in X-Next-Cursor
+def paged_response(items, next_cursor, status=200):
+    resp = jsonify(items)
+    resp.status_code = status
+    if next_cursor:
+        resp.headers["X-Next-Cursor"] = next_cursor
+    return resp
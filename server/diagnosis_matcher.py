@@ -0,0 +1,137 @@
+# server/diagnosis_matcher.py
+# Flags free-text diagnoses against a condition table in one regex pass.
+# CONDITIONS maps condition -> {"severity", "synonyms"}; every name and synonym
+# is compiled into a single alternation, so matching a diagnosis costs one scan
+# no matter how long the table grows.
+#
+# Override the table with a JSON file of the same shape:
+#   DIAGNOSIS_CONDITIONS=/path/to/conditions.json
+# then run the re-flagging job (POST /api/health/reflag) to apply it to
+# existing health checks.
+import json
+import os
+import re
+import time
+from firebase_config import db
+from db_helpers import commit_in_batches
+
+SEVERITIES = ("low", "moderate", "high", "critical")
+
+# ✅ Diseases that require flagging, with synonyms and severity
+CONDITIONS = {
+    # Infectious
+    "mastitis": {"severity": "moderate", "synonyms": ["mammitis", "udder infection"]},
+    "foot rot": {"severity": "moderate", "synonyms": ["footrot", "foul in the foot", "interdigital necrobacillosis"]},
+    "brucellosis": {"severity": "critical", "synonyms": ["contagious abortion", "bang's disease"]},
+    "tuberculosis": {"severity": "critical", "synonyms": ["bovine tb"]},
+    "bovine viral diarrhea": {"severity": "high", "synonyms": ["bovine viral diarrhoea", "bvd", "mucosal disease"]},
+    "blackleg": {"severity": "critical", "synonyms": ["black leg", "blackquarter", "black quarter"]},
+    "anthrax": {"severity": "critical", "synonyms": ["splenic fever"]},
+    "leptospirosis": {"severity": "high", "synonyms": ["lepto"]},
+    "rabies": {"severity": "critical", "synonyms": []},
+    "pinkeye": {"severity": "low", "synonyms": ["pink eye", "infectious bovine keratoconjunctivitis"]},
+    "lumpy skin disease": {"severity": "high", "synonyms": ["lumpy skin"]},
+    "campylobacteriosis": {"severity": "high", "synonyms": ["vibriosis"]},
+    "salmonellosis": {"severity": "high", "synonyms": ["salmonella"]},
+    "clostridial infection": {"severity": "high", "synonyms": ["enterotoxaemia", "enterotoxemia", "tetanus"]},
+
+    # Metabolic / nutritional
+    "milk fever": {"severity": "high", "synonyms": ["parturient paresis"]},
+    "ketosis": {"severity": "moderate", "synonyms": ["acetonaemia", "acetonemia"]},
+    "bloat": {"severity": "critical", "synonyms": ["ruminal tympany"]},
+    "displaced abomasum": {"severity": "high", "synonyms": ["twisted stomach"]},
+    "grass tetany": {"severity": "critical", "synonyms": ["grass staggers", "hypomagnesaemia", "hypomagnesemia"]},
+    "hypocalcemia": {"severity": "high", "synonyms": ["hypocalcaemia"]},
+    "ruminal acidosis": {"severity": "moderate", "synonyms": ["lactic acidosis", "grain overload"]},
+
+    # Parasitic / protozoal
+    "ticks": {"severity": "low", "synonyms": ["tick infestation"]},
+    "helminthiasis": {"severity": "low", "synonyms": ["worm infestation", "liver fluke", "fasciolosis"]},
+    "coccidiosis": {"severity": "moderate", "synonyms": []},
+    "trypanosomiasis": {"severity": "high", "synonyms": ["nagana"]},
+
+    # Reproductive / miscellaneous
+    "retained placenta": {"severity": "moderate", "synonyms": ["retained afterbirth", "retained fetal membranes"]},
+    "uterine infection": {"severity": "moderate", "synonyms": ["metritis", "pyometra"]},
+    "dystocia": {"severity": "high", "synonyms": ["difficult calving"]},
+    "pneumonia": {"severity": "high", "synonyms": ["shipping fever", "bovine respiratory disease"]},
+}
+
+
+def load_condition_table(path=None):
+    path = path or os.environ.get("DIAGNOSIS_CONDITIONS")
+    if not path:
+        return CONDITIONS
+    with open(path) as f:
+        return json.load(f)
+
+
+class DiagnosisMatcher:
+    def __init__(self, conditions):
+        self.conditions = conditions
+        self._by_term = {}
+        for name, spec in conditions.items():
+            if spec.get("severity", "moderate") not in SEVERITIES:
+                raise ValueError(f"unknown severity {spec['severity']!r} for {name!r}")
+            for term in [name, *spec.get("synonyms", [])]:
+                self._by_term[term.lower()] = name
+        # Longest terms first so "bovine viral diarrhea" wins over a shorter
+        # term starting at the same position; the lookahead lets matches overlap.
+        terms = sorted(self._by_term, key=len, reverse=True)
+        self._pattern = re.compile("(?=(" + "|".join(re.escape(t) for t in terms) + "))") if terms else None
+
+    # Matched conditions in order of first appearance: [{"condition", "severity"}]
+    def match(self, diagnosis):
+        if not diagnosis or self._pattern is None:
+            return []
+        found = {}
+        for m in self._pattern.finditer(diagnosis.lower()):
+            name = self._by_term[m.group(1)]
+            if name not in found:
+                found[name] = {"condition": name, "severity": self.conditions[name].get("severity", "moderate")}
+        return list(found.values())
+
+    def is_flagged(self, diagnosis):
+        return bool(diagnosis) and self._pattern is not None and self._pattern.search(diagnosis.lower()) is not None
+
+    # Fields stored on a health check: flagged, conditions, severity (highest match)
+    def flag_fields(self, diagnosis):
+        matches = self.match(diagnosis)
+        return {
+            "flagged": bool(matches),
+            "conditions": [m["condition"] for m in matches],
+            "severity": max((m["severity"] for m in matches), key=SEVERITIES.index, default=None),
+        }
+
+
+matcher = DiagnosisMatcher(load_condition_table())
+
+
+# --- Job: re-evaluate every health check against the current table.
+# Only records whose flag fields change are written, in chunked batches.
+# Historical records are not given auto-created treatments or notifications.
+# With a background job, reports progress and stops when cancelled.
+def reflag_healthchecks(matcher=matcher, job=None):
+    start = time.perf_counter()
+    scanned = 0
+    flagged = 0
+    writes = []
+    fields = ["diagnosis", "flagged", "conditions", "severity"]
+    for doc in db.collection("healthchecks").select(fields).stream():
+        scanned += 1
+        if job is not None:
+            job.check_cancelled()
+            job.progress(scanned, message="health checks scanned")
+        record = doc.to_dict()
+        new_fields = matcher.flag_fields(record.get("diagnosis") or "")
+        flagged += new_fields["flagged"]
+        if any(record.get(k) != v for k, v in new_fields.items()):
+            writes.append(("update", db.collection("healthchecks").document(doc.id), new_fields))
+    commits = commit_in_batches(writes, job=job)
+    return {
+        "scanned": scanned,
+        "changed": len(writes),
+        "flagged": flagged,
+        "commits": commits,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
@@ -1,10 +1,17 @@
 from flask import Blueprint, request, jsonify
 from firebase_config import db
-from datetime import datetime
+from db_helpers import page_query, paged_response, commit_in_batches
+from employees_routes import employee_map, get_employee_cached
+from versions import conditional
+from datetime import datetime, timedelta
 import uuid
 
 duties_api = Blueprint("duties_api", __name__)
 
+# Longest date range one roster request may cover
+ROSTER_MAX_DAYS = 92
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
 # ✅ Create new duty
 @duties_api.route("/api/duties", methods=["POST"])
 def add_duty():
@@ -12,13 +19,11 @@ def add_duty():
         data = request.json
         duty_id = str(uuid.uuid4())
 
-        # fetch employee to get department
-        emp_doc = db.collection("employees").document(data.get("employee_id")).get()
-        if not emp_doc.exists:
+        # employee (from the cached staff map) gives name and department
+        emp_data = get_employee_cached(data.get("employee_id"))
+        if emp_data is None:
             return jsonify({"error": "Employee not found"}), 404
 
-        emp_data = emp_doc.to_dict()
-
         duty_data = {
             "id": duty_id,
             "employee_id": data.get("employee_id"),
@@ -37,23 +42,137 @@ def add_duty():
         return jsonify({"error": str(e)}), 500
 
 
+# --- Util: Validate a roster rule; returns (task, weekdays or None for daily, department, employee_ids)
+#   {"task": "Morning milking", "frequency": "daily", "department": "Milking"}
+#   {"task": "Foot bath", "frequency": "weekly", "weekdays": ["mon", "thu"], "employee_ids": ["..."]}
+def parse_roster_rule(rule):
+    task = rule.get("task")
+    if not task:
+        raise ValueError("every rule needs a task")
+    frequency = (rule.get("frequency") or "daily").lower()
+    if frequency not in ("daily", "weekly"):
+        raise ValueError("frequency must be daily|weekly")
+    weekdays = None
+    if frequency == "weekly":
+        names = rule.get("weekdays") or []
+        if not names:
+            raise ValueError(f"weekly rule '{task}' needs weekdays")
+        try:
+            weekdays = {WEEKDAYS.index(str(day).lower()[:3]) for day in names}
+        except ValueError:
+            raise ValueError(f"weekdays must be from {', '.join(WEEKDAYS)}")
+    department = rule.get("department")
+    employee_ids = rule.get("employee_ids")
+    if not department and not employee_ids:
+        raise ValueError(f"rule '{task}' needs a department or employee_ids")
+    return task, weekdays, department, employee_ids
+
+
+# --- Util: Expand rules over [start, end] into (employee_id, employee, task, date) tuples
+def expand_roster(rules, start, end, employees):
+    by_department = {}
+    for emp_id, emp in employees.items():
+        by_department.setdefault((emp.get("department") or "").lower(), []).append(emp_id)
+
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    for task, weekdays, department, employee_ids in rules:
+        staff = list(employee_ids or by_department.get(department.lower(), []))
+        missing = [emp_id for emp_id in staff if emp_id not in employees]
+        if missing:
+            raise LookupError(f"Employee not found: {', '.join(missing)}")
+        for day in days:
+            if weekdays is not None and day.weekday() not in weekdays:
+                continue
+            date_str = day.strftime("%Y-%m-%d")
+            for emp_id in staff:
+                yield emp_id, employees[emp_id], task, date_str
+
+
+# ✅ Generate recurring duties for a date range
+# POST /api/duties/roster {"start": "YYYY-MM-DD", "end": "YYYY-MM-DD", "rules": [...], "dry_run": false}
+# Duties that already exist (same employee, task and date) are skipped, so a
+# roster can be re-posted after editing its rules.
+@duties_api.route("/api/duties/roster", methods=["POST"])
+def generate_roster():
+    try:
+        data = request.json or {}
+        try:
+            start = datetime.strptime(data.get("start") or "", "%Y-%m-%d").date()
+            end = datetime.strptime(data.get("end") or "", "%Y-%m-%d").date()
+        except ValueError:
+            return jsonify({"error": "start and end must be YYYY-MM-DD"}), 400
+        if end < start or (end - start).days >= ROSTER_MAX_DAYS:
+            return jsonify({"error": f"end must be on or after start, at most {ROSTER_MAX_DAYS} days"}), 400
+        if not data.get("rules"):
+            return jsonify({"error": "rules are required"}), 400
+        try:
+            rules = [parse_roster_rule(rule) for rule in data["rules"]]
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Staff map and the duties already in the range: one read each
+        start_str, end_str = start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+        existing = {
+            (d.get("employee_id"), d.get("task"), d.get("date"))
+            for d in (doc.to_dict() for doc in db.collection("duties")
+                      .where("date", ">=", start_str).where("date", "<=", end_str)
+                      .select(["employee_id", "task", "date"]).stream())
+        }
+        try:
+            slots = list(expand_roster(rules, start, end, employee_map()))
+        except LookupError as e:
+            return jsonify({"error": str(e)}), 404
+
+        now = datetime.utcnow()
+        duties = []
+        skipped = 0
+        for emp_id, emp, task, date_str in slots:
+            if (emp_id, task, date_str) in existing:
+                skipped += 1
+                continue
+            existing.add((emp_id, task, date_str))
+            duties.append({
+                "id": str(uuid.uuid4()),
+                "employee_id": emp_id,
+                "employee_name": emp.get("name"),
+                "task": task,
+                "department": emp.get("department"),
+                "date": date_str,
+                "status": data.get("status", "pending"),
+                "createdAt": now
+            })
+
+        if data.get("dry_run"):
+            return jsonify({"dry_run": True, "skipped": skipped, "duties": duties}), 200
+
+        commits = commit_in_batches(("set", db.collection("duties").document(d["id"]), d) for d in duties)
+        return jsonify({"message": "✅ Roster generated", "created": len(duties), "skipped": skipped,
+                        "commits": commits}), 201
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 # ✅ Get all duties
 @duties_api.route("/api/duties", methods=["GET"])
+@conditional("duties")
 def get_duties():
     try:
-        duties_ref = db.collection("duties").stream()
+        duties_ref, next_cursor = page_query("duties", request.args)
         duties = []
         for doc in duties_ref:
             d = doc.to_dict()
             d["id"] = d.get("id", doc.id)
             duties.append(d)
-        return jsonify(duties), 200
+        return paged_response(duties, next_cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 # ✅ Get duties by employee
 @duties_api.route("/api/duties/employee/<emp_id>", methods=["GET"])
+@conditional("duties")
 def get_duties_by_employee(emp_id):
     try:
         duties_ref = db.collection("duties").where("employee_id", "==", emp_id).stream()
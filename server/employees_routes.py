@@ -1,10 +1,37 @@
 from flask import Blueprint, request, jsonify
 from firebase_config import db
+from db_helpers import page_query, paged_response
+from cache import result_cache
+from propagation import queue_propagation
+from versions import conditional, versions
 from datetime import datetime
 import uuid
 
 employees_api = Blueprint("employees_api", __name__)
 
+
+# --- Util: {emp_id: employee} for the whole staff, read once per employees version
+# (the version moves on every employee write, so the map never outlives a change)
+def employee_map():
+    key = ("employee_map", versions.get("employees"))
+    employees = result_cache.get(key)
+    if employees is None:
+        result_cache.invalidate("employee_map")
+        employees = result_cache.set(key, {doc.id: doc.to_dict() for doc in db.collection("employees").stream()})
+    return employees
+
+
+# --- Util: One employee, from the map when it's there (a just-added one may not be yet)
+def get_employee_cached(emp_id):
+    if not emp_id:
+        return None
+    employee = employee_map().get(emp_id)
+    if employee is None:
+        doc = db.collection("employees").document(emp_id).get()
+        employee = doc.to_dict() if doc.exists else None
+    return employee
+
+
 # ✅ Create new employee
 @employees_api.route("/api/employees", methods=["POST"])
 def add_employee():
@@ -30,21 +57,25 @@ def add_employee():
 
 # ✅ Get all employees
 @employees_api.route("/api/employees", methods=["GET"])
+@conditional("employees")
 def get_employees():
     try:
-        emp_ref = db.collection("employees").stream()
+        emp_ref, next_cursor = page_query("employees", request.args)
         employees = []
         for doc in emp_ref:
             d = doc.to_dict()
             d["id"] = d.get("id", doc.id)
             employees.append(d)
-        return jsonify(employees), 200
+        return paged_response(employees, next_cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 # ✅ Get single employee
 @employees_api.route("/api/employees/<emp_id>", methods=["GET"])
+@conditional("employees")
 def get_employee(emp_id):
     try:
         doc = db.collection("employees").document(emp_id).get()
@@ -72,10 +103,13 @@ def update_employee(emp_id):
         update_payload = {k: v for k, v in update_payload.items() if v is not None}
 
         db.collection("employees").document(emp_id).update(update_payload)
+        # duties copy name and department: refresh them in the background
+        job_id = queue_propagation("employees", emp_id, update_payload)
         updated_doc = db.collection("employees").document(emp_id).get()
         updated_data = updated_doc.to_dict()
 
-        return jsonify({"message": "✅ Employee updated", "employee": updated_data}), 200
+        return jsonify({"message": "✅ Employee updated", "employee": updated_data,
+                        "propagationJob": job_id}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -0,0 +1,234 @@
+from flask import Blueprint, current_app, request, jsonify, Response, send_file, stream_with_context
+from firebase_config import db, bucket
+from db_helpers import parse_fields
+from jobs import job_kind, JOBS, SUCCEEDED
+from datetime import datetime
+import csv
+import io
+import os
+import tempfile
+
+export_api = Blueprint("export_api", __name__)
+
+# Collections that can be exported, with the date field used by ?from=&to=
+EXPORTABLE = {
+    "cows": None,
+    "milk_records": "date",
+    "healthchecks": "date",
+    "treatments": "date_given",
+    "vaccinations": "date_given",
+    "breeding": "breedingDate",
+    "feeding_records": "date",
+    "duties": "date",
+    "employees": None,
+    "notifications": "date",
+    "performance": "date",
+}
+
+# CSV columns per collection (after "id"), from the fields the routes write.
+# A CSV header has to be fixed before the first row, so columns come from
+# ?fields= when given, else from this schema; any other fields a document
+# carries go into the trailing EXTRA_COLUMN as a JSON object, so nothing is
+# dropped. performance records are free-form: everything but the date is extra.
+CSV_COLUMNS = {
+    "cows": ["tag_id", "name", "dob", "age_months", "breed", "color", "gender", "category", "status",
+             "type", "origin", "location", "sire", "dam", "daily_milk_avg", "sick_flag", "dead_flag",
+             "createdAt"],
+    "milk_records": ["cow_id", "date", "morning", "noon", "evening", "daily_total", "milker", "updated_at"],
+    "healthchecks": ["cow", "cowname", "date", "temperature", "weight", "symptoms", "diagnosis", "vet",
+                     "notes", "flagged", "conditions", "severity", "createdAt"],
+    "treatments": ["cow_id", "cow", "cowname", "healthcheck_id", "disease", "drug", "treatment", "medicine",
+                   "dosage", "method", "vet", "date_given", "start_date", "next_followup", "follow_up_date",
+                   "notes", "createdAt"],
+    "vaccinations": ["cow_id", "vaccine", "dosage", "method", "date_given", "next_booster", "vet", "notes",
+                     "createdAt"],
+    "breeding": ["cow", "cowname", "dam", "sire", "method", "bull", "bullDam", "bullSire", "breedingDate",
+                 "expectedBirth", "repeatDate", "vet", "notes", "inbreedingCoefficient", "inbreedingWarning",
+                 "createdAt"],
+    "feeding_records": ["cow_id", "cow", "date", "category", "milk_l", "calf_meal_kg", "dairy_meal_kg",
+                        "silage_kg", "water_l", "hay", "salt_g", "notes"],
+    "duties": ["employee_id", "employee_name", "task", "department", "date", "status", "createdAt"],
+    "employees": ["name", "department", "role", "contact", "createdAt"],
+    "notifications": ["cow_id", "title", "message", "date", "read", "createdAt"],
+    "performance": ["date"],
+}
+EXTRA_COLUMN = "extra"
+
+# Documents fetched per round-trip while streaming
+EXPORT_PAGE_SIZE = 500
+
+# Background exports go to the Storage bucket under exports/, or to this
+# directory when there is no bucket (local backend)
+EXPORT_DIR = os.environ.get("EXPORT_DIR", os.path.join(tempfile.gettempdir(), "dairy_exports"))
+EXPORT_MIMETYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        return current_app.json.dumps(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+# --- Util: Walk a collection page by page so only one page is ever in memory
+def iter_documents(collection, date_from=None, date_to=None, fields=None):
+    date_field = EXPORTABLE.get(collection)
+    query = db.collection(collection)
+    if date_field and (date_from or date_to):
+        if date_from:
+            query = query.where(date_field, ">=", date_from)
+        if date_to:
+            query = query.where(date_field, "<=", date_to)
+        query = query.order_by(date_field)
+    query = query.order_by("__name__")
+    if fields is not None:
+        query = query.select(fields)
+
+    last = None
+    while True:
+        page = query.limit(EXPORT_PAGE_SIZE)
+        if last is not None:
+            page = page.start_after(last)
+        docs = list(page.stream())
+        for doc in docs:
+            yield {"id": doc.id, **doc.to_dict()}
+        if len(docs) < EXPORT_PAGE_SIZE:
+            return
+        last = docs[-1]
+
+
+def _ndjson_rows(rows):
+    for row in rows:
+        yield current_app.json.dumps(row) + "\n"
+
+
+# columns: the explicit ?fields= list (documents are projected to it), or None for the schema
+def _csv_rows(rows, collection, columns=None):
+    buf = io.StringIO()
+    if columns is None:
+        columns = ["id"] + CSV_COLUMNS[collection]
+        fieldnames = columns + [EXTRA_COLUMN]
+    else:
+        fieldnames = columns
+    known = set(columns)
+    writer = csv.DictWriter(buf, fieldnames=fieldnames)
+    writer.writeheader()
+    for row in rows:
+        out = {k: _csv_value(v) for k, v in row.items() if k in known}
+        extra = {k: v for k, v in row.items() if k not in known}
+        if extra:
+            out[EXTRA_COLUMN] = current_app.json.dumps(extra)
+        writer.writerow(out)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate(0)
+    if buf.tell():
+        yield buf.getvalue()  # header of an empty export
+
+
+def _check_export_args(fmt, date_from, date_to):
+    if fmt not in EXPORT_MIMETYPES:
+        raise ValueError("format must be ndjson|csv")
+    for value in (date_from, date_to):
+        if value:
+            try:
+                datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                raise ValueError("invalid date")
+
+
+def _export_body(rows, fmt, collection, fields):
+    if fmt == "csv":
+        return _csv_rows(rows, collection, ["id"] + fields if fields is not None else None)
+    return _ndjson_rows(rows)
+
+
+# ✅ Stream a collection as NDJSON or CSV
+# GET /api/export/<collection>?format=ndjson|csv&from=YYYY-MM-DD&to=YYYY-MM-DD&fields=a,b
+@export_api.route("/api/export/<collection>", methods=["GET"])
+def export_collection(collection):
+    if collection not in EXPORTABLE:
+        return jsonify({"error": f"Unknown collection: {collection}"}), 404
+
+    fmt = (request.args.get("format") or "ndjson").lower()
+    date_from = request.args.get("from")
+    date_to = request.args.get("to")
+    try:
+        _check_export_args(fmt, date_from, date_to)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    fields = parse_fields(request.args)
+    rows = iter_documents(collection, date_from, date_to, fields)
+    body = _export_body(rows, fmt, collection, fields)
+
+    resp = Response(stream_with_context(body), mimetype=EXPORT_MIMETYPES[fmt])
+    resp.headers["Content-Disposition"] = f"attachment; filename={collection}.{fmt}"
+    resp.headers["X-Accel-Buffering"] = "no"  # let proxies pass chunks straight through
+    return resp
+
+
+# --- Background export: POST /api/jobs/export
+# {"collection": "milk_records", "format": "csv", "from": "...", "to": "...", "fields": "a,b"}
+def _validate_export_job(params):
+    if params.get("collection") not in EXPORTABLE:
+        raise ValueError(f"Unknown collection: {params.get('collection')}")
+    _check_export_args((params.get("format") or "ndjson").lower(), params.get("from"), params.get("to"))
+    if params.get("fields") is not None and not isinstance(params["fields"], str):
+        raise ValueError("fields must be a comma-separated string")
+
+
+@job_kind("export", max_concurrent=2, validate=_validate_export_job)
+def _export_job(job, **params):
+    collection = params["collection"]
+    fmt = (params.get("format") or "ndjson").lower()
+    fields = parse_fields(params)
+
+    def tracked(rows):
+        for count, row in enumerate(rows, 1):
+            job.check_cancelled()
+            job.progress(count, message=f"{count} {collection} exported")
+            yield row
+
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    path = os.path.join(EXPORT_DIR, f"{job.id}.{fmt}")
+    rows = 0
+    try:
+        with open(path, "w", newline="") as f:
+            for chunk in _export_body(tracked(iter_documents(collection, params.get("from"), params.get("to"), fields)),
+                                      fmt, collection, fields):
+                f.write(chunk)
+            rows = job.progress_state["done"]
+        result = {"collection": collection, "format": fmt, "rows": rows, "bytes": os.path.getsize(path)}
+        if bucket is None:
+            return {**result, "file": path}
+        blob = bucket.blob(f"exports/{job.id}.{fmt}")
+        blob.upload_from_filename(path, content_type=EXPORT_MIMETYPES[fmt])
+        os.remove(path)
+        return {**result, "blob": blob.name}
+    except Exception:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+
+
+# ✅ Download the file produced by an export job
+@export_api.route("/api/export/jobs/<job_id>", methods=["GET"])
+def download_export(job_id):
+    try:
+        snap = db.collection(JOBS).document(job_id).get()
+        job = snap.to_dict() if snap.exists else None
+        if job is None or job.get("kind") != "export":
+            return jsonify({"error": "Export job not found"}), 404
+        if job.get("status") != SUCCEEDED:
+            return jsonify({"error": f"Export is {job.get('status')}"}), 409
+        result = job["result"]
+        name = f"{result['collection']}.{result['format']}"
+        mimetype = EXPORT_MIMETYPES[result["format"]]
+        if result.get("blob"):
+            return send_file(bucket.blob(result["blob"]).open("rb"), mimetype=mimetype,
+                             as_attachment=True, download_name=name)
+        return send_file(result["file"], mimetype=mimetype, as_attachment=True, download_name=name)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
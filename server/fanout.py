@@ -0,0 +1,30 @@
+# server/fanout.py
+# Run independent blocking Firestore calls concurrently instead of one after another,
+# on a bounded thread pool (the calls themselves stay synchronous).
+#   cow, bull = run_concurrently(lambda: get_cow(a), lambda: get_cow(b))
+# Each call runs with a copy of the caller's context, so the Flask request
+# context (and per-request metrics) follow it into the worker thread.
+# Calls made from a pool thread (a fanned-out call that fans out again) run
+# inline: a pool thread blocking on work queued behind it in the same bounded
+# pool could otherwise deadlock the process under load.
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+FANOUT_WORKERS = int(os.environ.get("FANOUT_WORKERS", "32"))
+
+_pool = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="fanout")
+_local = threading.local()
+
+
+def _in_pool(call):
+    _local.in_pool = True
+    return call()
+
+
+def run_concurrently(*calls):
+    if len(calls) == 1 or getattr(_local, "in_pool", False):
+        return [call() for call in calls]
+    futures = [_pool.submit(contextvars.copy_context().run, _in_pool, call) for call in calls]
+    return [f.result() for f in futures]
@@ -0,0 +1,137 @@
+# server/feeding_engine.py
+# Herd-wide feeding plans computed over arrays instead of cow by cow.
+# Produces the same plans as feeding_routes.calculate_feeding, but for the
+# whole herd at once, and saves them with chunked batch writes.
+from datetime import datetime
+import numpy as np
+from firebase_config import db, DESCENDING
+from db_helpers import commit_in_batches
+from fanout import run_concurrently
+
+# Plan templates; cow name, date and computed amounts are filled in per cow
+MILKER_PLAN = {"category": "Milker", "salt_g": 250, "silage_kg": 5, "hay": "Unlimited",
+               "notes": "Formula (Production-7)/2 applied"}
+CALF_PLANS = {
+    0: {"category": "Calf (1st month)", "milk_l": 6, "calf_meal_kg": 0, "water_l": 0, "hay": 0,
+        "salt_g": 100, "notes": "Newborn calf feeding"},
+    1: {"category": "Calf (2nd month)", "milk_l": 4, "calf_meal_kg": 1, "water_l": 1, "hay": 1,
+        "salt_g": 100, "notes": "Transition stage"},
+    2: {"category": "Calf (3rd month)", "milk_l": 2, "calf_meal_kg": 2, "water_l": 1, "hay": 1,
+        "salt_g": 100, "notes": "Weaning stage"},
+}
+WEANED_CALF_PLAN = {"milk_l": 0, "calf_meal_kg": 4, "water_l": 2, "hay": 1, "salt_g": 100,
+                    "notes": "Post-weaning, up to insemination"}
+DRY_PLAN = {"category": "Dry Cow", "silage_kg": 5, "hay": 1, "salt_g": 200, "notes": "Dry cow feeding"}
+
+# Rule codes produced by the vectorized pass
+NO_PLAN, MILKER, CALF_0, CALF_1, CALF_2, CALF_WEANED, DRY = range(7)
+
+
+# --- Util: Age in whole calendar months for an array of YYYY-MM-DD strings (-1 if unknown)
+def age_months_array(dobs, today):
+    ages = np.full(len(dobs), -1, dtype=np.int64)
+    valid = np.array([bool(d) for d in dobs], dtype=bool)
+    if valid.any():
+        try:
+            dob_m = np.array([d for d in dobs if d], dtype="datetime64[D]").astype("datetime64[M]")
+        except ValueError:
+            # a malformed dob somewhere: fall back to parsing one by one
+            parsed = []
+            for i, d in enumerate(dobs):
+                if d:
+                    try:
+                        parsed.append(np.datetime64(datetime.strptime(d, "%Y-%m-%d").date(), "M"))
+                    except ValueError:
+                        valid[i] = False
+            dob_m = np.array(parsed, dtype="datetime64[M]")
+        today_m = np.datetime64(today.strftime("%Y-%m"), "M")
+        ages[valid] = (today_m - dob_m).astype(np.int64)
+    return ages, valid
+
+
+# --- Core: rule codes + dairy meal amounts for the whole herd
+def classify_herd(types, milk, ages, has_age):
+    types = np.asarray(types, dtype=object)
+    is_calf = (types == "calf") & has_age
+    codes = np.select(
+        [types == "milker",
+         is_calf & (ages == 0),
+         is_calf & (ages == 1),
+         is_calf & (ages == 2),
+         is_calf,
+         types == "dry"],
+        [MILKER, CALF_0, CALF_1, CALF_2, CALF_WEANED, DRY],
+        default=NO_PLAN,
+    )
+    dairy_meal = np.round(np.maximum((np.asarray(milk, dtype=float) - 7) / 2, 0), 2)
+    return codes, dairy_meal
+
+
+# cows: [(cow_id, cow_dict)], latest_milk: {cow_id: daily_total}
+# Returns [(cow_id, plan)] for every cow that has a feeding rule
+def build_feeding_plans(cows, latest_milk, today=None):
+    today = today or datetime.today()
+    if not cows:
+        return []
+    ids = [cid for cid, _ in cows]
+    types = [c.get("type") for _, c in cows]
+    milk = [float(latest_milk.get(cid) or 0) for cid in ids]
+    ages, has_age = age_months_array([c.get("dob") for _, c in cows], today)
+    codes, dairy_meal = classify_herd(types, milk, ages, has_age)
+
+    date_str = today.strftime("%Y-%m-%d")
+    plans = []
+    for i in np.flatnonzero(codes != NO_PLAN):
+        code = codes[i]
+        cow_name = cows[i][1].get("name")
+        if code == MILKER:
+            plan = {"cow": cow_name, **MILKER_PLAN, "dairy_meal_kg": float(dairy_meal[i])}
+        elif code == DRY:
+            plan = {"cow": cow_name, **DRY_PLAN}
+        elif code == CALF_WEANED:
+            plan = {"cow": cow_name, "category": f"Calf ({int(ages[i]) + 1} months+)", **WEANED_CALF_PLAN}
+        else:
+            plan = {"cow": cow_name, **CALF_PLANS[code - CALF_0]}
+        plan["date"] = date_str
+        plans.append((ids[i], plan))
+    return plans
+
+
+# --- Util: Latest daily_total per cow: one (cow_id ==, date desc) limit 1 query
+# each (milk_records composite index), fanned out concurrently. However old the
+# latest record is, it counts, as in generate_single.
+def latest_milk_by_cow(cow_ids):
+    def latest(cow_id):
+        docs = (db.collection("milk_records")
+                .where("cow_id", "==", cow_id)
+                .order_by("date", direction=DESCENDING)
+                .select(["daily_total"])
+                .limit(1)
+                .stream())
+        return next((doc.to_dict().get("daily_total") or 0 for doc in docs), None)
+
+    cow_ids = list(cow_ids)
+    totals = run_concurrently(*[lambda cid=cid: latest(cid) for cid in cow_ids]) if cow_ids else []
+    return {cid: total for cid, total in zip(cow_ids, totals) if total is not None}
+
+
+# --- Generate and save plans for the whole herd in chunked batch writes
+# (with a background job: progress, and a cancel stops it between commits)
+def generate_herd_plans(cows=None, today=None, job=None):
+    if cows is None:
+        cows = [(d.id, d.to_dict()) for d in db.collection("cows").select(["name", "type", "dob"]).stream()]
+    # only milkers' plans depend on production
+    latest_milk = latest_milk_by_cow(cid for cid, cow in cows if cow.get("type") == "milker")
+    plans = build_feeding_plans(cows, latest_milk, today)
+    if job is not None:
+        job.progress(len(plans), len(cows), message="plans built")
+
+    writes = []
+    records = []
+    for cow_id, plan in plans:
+        ref = db.collection("feeding_records").document()
+        plan["cow_id"] = cow_id
+        writes.append(("set", ref, plan))
+        records.append({**plan, "id": ref.id})
+    commits = commit_in_batches(writes, job=job)
+    return records, commits
@@ -1,9 +1,12 @@
 from flask import Blueprint, jsonify, request
-import firebase_admin
-from firebase_admin import firestore
+from firebase_config import db, DESCENDING
+from db_helpers import page_query, paged_response
+from feeding_engine import generate_herd_plans
+from herd_cache import herd, get_cow
+from versions import conditional
+from jobs import job_kind
 from datetime import datetime
 
-db = firestore.client()
 feeding_bp = Blueprint("feeding", __name__)
 
 def calculate_feeding(cow, milk_record=None):
@@ -20,7 +23,7 @@ def calculate_feeding(cow, milk_record=None):
         age_months = (today.year - dob_date.year) * 12 + (today.month - dob_date.month)
 
     if cow_type == "milker":
-        production = milk_record.get("total") if milk_record else 0
+        production = (milk_record.get("daily_total") or milk_record.get("total") or 0) if milk_record else 0
         dairy_meal = max((production - 7) / 2, 0)
         feeding_plan = {
             "cow": cow_name,
@@ -92,47 +95,47 @@ def calculate_feeding(cow, milk_record=None):
 # Generate feeding for a single cow
 @feeding_bp.route("/generate/<cow_id>", methods=["POST"])
 def generate_single(cow_id):
-    cow_doc = db.collection("cows").document(cow_id).get()
-    if not cow_doc.exists:
+    cow = get_cow(cow_id)
+    if cow is None:
         return jsonify({"error": "Cow not found"}), 404
-    cow = cow_doc.to_dict()
-    milk_record_doc = db.collection("milk_records").document(cow_id).get()
-    milk_record = milk_record_doc.to_dict() if milk_record_doc.exists else None
+    # latest milk record for this cow
+    milk_docs = (db.collection("milk_records").where("cow_id", "==", cow_id)
+                 .order_by("date", direction=DESCENDING).limit(1).stream())
+    milk_record = next((m.to_dict() for m in milk_docs), None)
 
     plan = calculate_feeding(cow, milk_record)
     db.collection("feeding_records").add(plan)
     plan["id"] = "temp"  # optional, Firestore auto-generated ID
     return jsonify({"message": "Feeding record generated", "record": plan}), 201
 
-# Generate for all cows (already in your code)
+# Generate for all cows: vectorized rules + chunked batch writes (see feeding_engine.py)
 @feeding_bp.route("/generate_and_save", methods=["POST"])
 def generate_and_save():
-    cows_ref = db.collection("cows").stream()
-    milk_records_ref = db.collection("milk_records").stream()
-    milk_map = {m.id: m.to_dict() for m in milk_records_ref}
-    feeding_records = []
-
-    for cow_doc in cows_ref:
-        cow = cow_doc.to_dict()
-        cow_id = cow_doc.id
-        milk_record = milk_map.get(cow_id)
-        plan = calculate_feeding(cow, milk_record)
-        if plan:
-            db.collection("feeding_records").add(plan)
-            feeding_records.append(plan)
-
+    cows = herd.items() if herd.ready() else None
+    feeding_records, _ = generate_herd_plans(cows)
     return jsonify({"message": "Feeding records generated and saved", "records": feeding_records}), 201
 
+# Same, as a background job: POST /api/jobs/feeding_plans
+@job_kind("feeding_plans")
+def _feeding_plans_job(job):
+    cows = herd.items() if herd.ready() else None
+    feeding_records, commits = generate_herd_plans(cows, job=job)
+    return {"saved": len(feeding_records), "commits": commits}
+
 # Fetch all feeding records
 @feeding_bp.route("/records", methods=["GET"])
+@conditional("feeding_records")
 def get_feeding_records():
     records = []
-    docs = db.collection("feeding_records").order_by("date", direction=firestore.Query.DESCENDING).stream()
+    try:
+        docs, next_cursor = page_query("feeding_records", request.args, order_by="date", direction=DESCENDING)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     for doc in docs:
         record = doc.to_dict()
         record["id"] = doc.id
         records.append(record)
-    return jsonify(records), 200
+    return paged_response(records, next_cursor)
 
 # Delete record
 @feeding_bp.route("/records/<record_id>", methods=["DELETE"])
@@ -142,6 +145,7 @@ def delete_record(record_id):
 
 # Stock summary
 @feeding_bp.route("/stock_summary", methods=["GET"])
+@conditional("feeding_records")
 def stock_summary():
     totals = {}
     docs = db.collection("feeding_records").stream()
@@ -1,18 +1,48 @@
 # server/firebase_config.py
-import firebase_admin
-from firebase_admin import credentials, firestore, storage
+# Single place where the data backend is chosen. Every blueprint imports `db`
+# (and the write sentinels below) from here instead of building its own client.
+#   DAIRY_DB_BACKEND=firestore (default) -> Firebase Admin Firestore client
+#   DAIRY_DB_BACKEND=local               -> in-process stand-in (local_store.py)
+# Either client is wrapped by db_events, whose hooks (before_commit, after_write)
+# are re-exported here for modules that react to writes.
+import os
+from db_events import observe_client, before_commit, after_write
 
-# Path to service account
-cred = credentials.Certificate(r"C:\Users\hp\Desktop\DAIRY FARM\dairy-farm-backend\server\serviceAccountKey.json")
+BACKEND = os.environ.get("DAIRY_DB_BACKEND", "firestore").lower()
 
-# Initialize app if not already
-if not firebase_admin._apps:
-    firebase_admin.initialize_app(cred, {
-        "storageBucket": "dairy-farm-ffe74.appspot.com"  # ✅ bucket name without gs://
-    })
+if BACKEND == "local":
+    import local_store
+    from local_store import (
+        ASCENDING, DESCENDING, DELETE_FIELD, SERVER_TIMESTAMP, Increment, transactional,
+    )
 
-# Firestore DB
-db = firestore.client()
+    db = observe_client(local_store.LocalClient())
+    bucket = None
+else:
+    import firebase_admin
+    from firebase_admin import credentials, firestore, storage
 
-# Firebase Storage bucket
-bucket = storage.bucket()
+    ASCENDING = firestore.Query.ASCENDING
+    DESCENDING = firestore.Query.DESCENDING
+    DELETE_FIELD = firestore.DELETE_FIELD
+    SERVER_TIMESTAMP = firestore.SERVER_TIMESTAMP
+    Increment = firestore.Increment
+    transactional = firestore.transactional
+
+    # Path to service account
+    cred = credentials.Certificate(os.environ.get(
+        "FIREBASE_CREDENTIALS",
+        r"C:\Users\hp\Desktop\DAIRY FARM\dairy-farm-backend\server\serviceAccountKey.json",
+    ))
+
+    # Initialize app if not already
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(cred, {
+            "storageBucket": "dairy-farm-ffe74.appspot.com"  # ✅ bucket name without gs://
+        })
+
+    # Firestore DB (wrapped so writes can be observed and /metrics can count operations)
+    db = observe_client(firestore.client())
+
+    # Firebase Storage bucket
+    bucket = storage.bucket()
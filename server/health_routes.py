@@ -1,56 +1,19 @@
 from flask import Blueprint, request, jsonify
 from firebase_config import db
+from db_helpers import page_query, paged_response
+from side_effects import create_with_side_effects, update_with_side_effects
+from diagnosis_matcher import matcher, reflag_healthchecks
+from versions import conditional
+from jobs import job_kind
+from cascade import remove_document, queue_cascade, MODES, DELETE
 from datetime import datetime
 import uuid
 
 health_api = Blueprint("health_api", __name__)
 
-# ✅ Comprehensive list of diseases that require flagging
-FLAG_CONDITIONS = [
-    # Infectious
-    "mastitis", "foot rot", "brucellosis", "tuberculosis", "bovine viral diarrhea",
-    "blackleg", "anthrax", "leptospirosis", "rabies", "pinkeye", "lumpy skin disease",
-    "campylobacteriosis", "salmonellosis", "clostridial infection",
-
-    # Metabolic / nutritional
-    "milk fever", "ketosis", "bloat", "displaced abomasum", "grass tetany",
-    "hypocalcemia", "ruminal acidosis",
-
-    # Parasitic / protozoal
-    "ticks", "helminthiasis", "coccidiosis", "trypanosomiasis",
-
-    # Reproductive / miscellaneous
-    "retained placenta", "uterine infection", "dystocia", "pneumonia",
-]
-
 # ✅ Utility: determine if a diagnosis should be flagged
 def is_flagged(diagnosis: str) -> bool:
-    diagnosis_lower = diagnosis.lower()
-    return any(condition in diagnosis_lower for condition in FLAG_CONDITIONS)
-
-# ✅ Utility: auto-create treatment
-def create_treatment_from_healthcheck(health_data):
-    try:
-        treat_id = str(uuid.uuid4())
-        treatment_data = {
-            "id": treat_id,
-            "cow": health_data.get("cow"),
-            "cowname": health_data.get("cowname"),
-            "disease": health_data.get("diagnosis"),
-            "treatment": "Pending vet prescription",
-            "medicine": "TBD",
-            "dosage": "",
-            "vet": health_data.get("vet"),
-            "start_date": health_data.get("date"),
-            "follow_up_date": "",
-            "notes": f"Auto-created from health check. Symptoms: {health_data.get('symptoms')}",
-            "createdAt": datetime.utcnow(),
-        }
-        db.collection("treatments").document(treat_id).set(treatment_data)
-        return treatment_data
-    except Exception as e:
-        print("❌ Error auto-creating treatment:", str(e))
-        return None
+    return matcher.is_flagged(diagnosis)
 
 # ==================== CREATE HEALTH CHECK ====================
 @health_api.route("/api/health", methods=["POST"])
@@ -59,9 +22,9 @@ def add_health_check():
         data = request.json
         hc_id = str(uuid.uuid4())
 
-        # Flagging
+        # Flagging: matched conditions and highest severity
         diagnosis = data.get("diagnosis") or ""
-        flagged = is_flagged(diagnosis)
+        flags = matcher.flag_fields(diagnosis)
 
         health_data = {
             "id": hc_id,
@@ -74,26 +37,13 @@ def add_health_check():
             "diagnosis": data.get("diagnosis"),
             "vet": data.get("vet"),
             "notes": data.get("notes"),
-            "flagged": flagged,
+            **flags,
             "createdAt": datetime.utcnow(),
         }
 
-        db.collection("healthchecks").document(hc_id).set(health_data)
-
-        created_treatment = None
-        if flagged:
-            created_treatment = create_treatment_from_healthcheck(health_data)
-
-            notification_data = {
-                "id": str(uuid.uuid4()),
-                "cow_id": health_data["cow"],
-                "title": "Observation & Treatment Required",
-                "message": f"Cow {health_data['cow']} diagnosed with {health_data['diagnosis']}. Treatment auto-created.",
-                "date": datetime.utcnow().strftime("%Y-%m-%d"),
-                "read": False,
-                "createdAt": datetime.utcnow(),
-            }
-            db.collection("notifications").document(notification_data["id"]).set(notification_data)
+        # Health check + auto treatment + notification in one batched write
+        derived = create_with_side_effects("healthchecks", hc_id, health_data)
+        created_treatment = (derived.get("treatments") or [None])[0]
 
         return jsonify({
             "message": "✅ Health check added successfully",
@@ -106,9 +56,10 @@ def add_health_check():
 
 # ==================== GET ALL HEALTH CHECKS ====================
 @health_api.route("/api/health", methods=["GET"])
+@conditional("healthchecks")
 def get_health_checks():
     try:
-        hc_ref = db.collection("healthchecks").stream()
+        hc_ref, next_cursor = page_query("healthchecks", request.args)
         health_checks = []
         for doc in hc_ref:
             hc = doc.to_dict()
@@ -116,7 +67,9 @@ def get_health_checks():
             hc["cowname"] = hc.get("cowname", hc.get("cow", ""))
             hc["flagged"] = hc.get("flagged", False)
             health_checks.append(hc)
-        return jsonify(health_checks), 200
+        return paged_response(health_checks, next_cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -126,7 +79,7 @@ def update_health_check(hc_id):
     try:
         data = request.json
         diagnosis = data.get("diagnosis") or ""
-        flagged = is_flagged(diagnosis)
+        flags = matcher.flag_fields(diagnosis)
 
         update_payload = {
             "cow": data.get("cow"),
@@ -138,33 +91,17 @@ def update_health_check(hc_id):
             "diagnosis": data.get("diagnosis"),
             "vet": data.get("vet"),
             "notes": data.get("notes"),
-            "flagged": flagged,
             "updatedAt": datetime.utcnow(),
         }
         update_payload = {k: v for k, v in update_payload.items() if v is not None}
+        update_payload.update(flags)
 
-        db.collection("healthchecks").document(hc_id).update(update_payload)
-
-        updated_doc = db.collection("healthchecks").document(hc_id).get()
-        updated_data = updated_doc.to_dict()
+        # Update + auto treatment + notification in one transaction
+        updated_data, derived = update_with_side_effects("healthchecks", hc_id, update_payload)
         updated_data["id"] = updated_data.get("id", hc_id)
         updated_data["cowname"] = updated_data.get("cowname", updated_data.get("cow", ""))
         updated_data["flagged"] = updated_data.get("flagged", False)
-
-        created_treatment = None
-        if flagged:
-            created_treatment = create_treatment_from_healthcheck(updated_data)
-
-            notification_data = {
-                "id": str(uuid.uuid4()),
-                "cow_id": updated_data["cow"],
-                "title": "Observation & Treatment Required",
-                "message": f"Cow {updated_data['cow']} diagnosed with {updated_data['diagnosis']}. Treatment auto-created.",
-                "date": datetime.utcnow().strftime("%Y-%m-%d"),
-                "read": False,
-                "createdAt": datetime.utcnow(),
-            }
-            db.collection("notifications").document(notification_data["id"]).set(notification_data)
+        created_treatment = (derived.get("treatments") or [None])[0]
 
         return jsonify({
             "message": "✅ Health check updated",
@@ -172,20 +109,37 @@ def update_health_check(hc_id):
             "treatment": created_treatment
         }), 200
 
+    except KeyError:
+        return jsonify({"error": "Health check not found"}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# ==================== RE-FLAG HEALTH CHECKS ====================
+# Re-evaluate all stored health checks after the condition table changes
+@health_api.route("/api/health/reflag", methods=["POST"])
+def reflag_health_checks():
+    try:
+        report = reflag_healthchecks()
+        return jsonify({"message": "✅ Health checks re-flagged", **report}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Same, as a background job: POST /api/jobs/reflag_healthchecks
+@job_kind("reflag_healthchecks")
+def _reflag_job(job):
+    return reflag_healthchecks(job=job)
+
 # ==================== DELETE HEALTH CHECK ====================
 @health_api.route("/api/health/<hc_id>", methods=["DELETE"])
 def delete_health_check(hc_id):
+    mode = request.args.get("mode", DELETE)
+    if mode not in MODES:
+        return jsonify({"error": f"mode must be {'|'.join(MODES)}"}), 400
     try:
-        # Delete associated treatment if exists
-        treatments_ref = db.collection("treatments").where("cow", "==", hc_id).stream()
-        for treat_doc in treatments_ref:
-            db.collection("treatments").document(treat_doc.id).delete()
-
-        # Delete health check
-        db.collection("healthchecks").document(hc_id).delete()
-        return jsonify({"message": f"✅ Health check {hc_id} and associated treatment deleted"}), 200
+        # Delete health check; its auto-created treatment (healthcheck_id) follows in the background
+        remove_document("healthchecks", hc_id, mode)
+        job_id = queue_cascade("healthchecks", hc_id, mode)
+        return jsonify({"message": f"✅ Health check {hc_id} and associated treatment deleted",
+                        "cascadeJob": job_id}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -0,0 +1,189 @@
+# server/herd_cache.py
+# Process-wide in-memory copy of the `cows` collection, kept fresh by a
+# snapshot listener (Firestore on_snapshot, or the local backend's change feed).
+# If a listener cannot be attached, a polling thread re-reads the herd instead.
+# Hot paths look cows up here instead of issuing Firestore reads.
+import os
+import threading
+import time
+from firebase_config import db
+from db_helpers import get_docs
+
+# Fields with a secondary index: herd.ids_by("status", "sick")
+INDEXED_FIELDS = ("category", "status", "type", "location")
+
+# Polling fallback interval, and how long callers wait for the first snapshot
+POLL_SECONDS = float(os.environ.get("HERD_CACHE_POLL_SECONDS", "30"))
+READY_TIMEOUT = float(os.environ.get("HERD_CACHE_READY_TIMEOUT", "10"))
+
+
+class HerdCache:
+    def __init__(self, collection="cows"):
+        self.collection = collection
+        self._lock = threading.RLock()
+        self._cows = {}
+        self._indexes = {field: {} for field in INDEXED_FIELDS}
+        self._sorted_ids = None
+        self.version = 0
+        self._ready = threading.Event()
+        self._waited = False
+        self._watch = None
+        self._poller = None
+        self._listeners = []
+
+    # --- Lifecycle
+    def start(self):
+        with self._lock:
+            if self._watch is not None or self._poller is not None:
+                return
+            try:
+                self._watch = db.collection(self.collection).on_snapshot(self._on_snapshot)
+            except Exception as e:
+                print("❌ Herd listener unavailable, polling instead:", str(e))
+                self._poller = threading.Thread(target=self._poll, daemon=True)
+                self._poller.start()
+
+    def stop(self):
+        with self._lock:
+            if self._watch is not None:
+                self._watch.unsubscribe()
+                self._watch = None
+
+    # Starts the cache and waits up to READY_TIMEOUT for the first snapshot.
+    # Only the first call in a process waits (app.py makes it at startup).
+    def wait_ready(self, timeout=READY_TIMEOUT):
+        self.start()
+        if not self._waited:
+            self._waited = True
+            self._ready.wait(timeout)
+        return self._ready.is_set()
+
+    # Non-blocking once the startup wait is done: False until the first snapshot
+    # arrives, and callers fall back to Firestore meanwhile
+    def ready(self):
+        if not self._waited:
+            return self.wait_ready()
+        return self._ready.is_set()
+
+    # Called with (change_type_name, cow_id, cow) after every applied change
+    def subscribe(self, callback):
+        self._listeners.append(callback)
+
+    # --- Change handling
+    def _on_snapshot(self, docs, changes, read_time):
+        with self._lock:
+            for change in changes:
+                doc = change.document
+                if change.type.name == "REMOVED":
+                    self._remove(doc.id)
+                else:
+                    self._put(doc.id, doc.to_dict())
+            self.version += 1
+        self._ready.set()
+        for change in changes:
+            self._emit(change.type.name, change.document.id)
+
+    def _poll(self):
+        while True:
+            try:
+                fresh = {d.id: d.to_dict() for d in db.collection(self.collection).stream()}
+                changed = []
+                with self._lock:
+                    for cow_id in list(self._cows):
+                        if cow_id not in fresh:
+                            self._remove(cow_id)
+                            changed.append(("REMOVED", cow_id))
+                    for cow_id, cow in fresh.items():
+                        if self._cows.get(cow_id) != cow:
+                            kind = "MODIFIED" if cow_id in self._cows else "ADDED"
+                            self._put(cow_id, cow)
+                            changed.append((kind, cow_id))
+                    if changed or not self._ready.is_set():
+                        self.version += 1
+                self._ready.set()
+                for kind, cow_id in changed:
+                    self._emit(kind, cow_id)
+            except Exception as e:
+                print("❌ Herd poll failed:", str(e))
+            time.sleep(POLL_SECONDS)
+
+    def _emit(self, kind, cow_id):
+        cow = self._cows.get(cow_id)
+        for callback in list(self._listeners):
+            try:
+                callback(kind, cow_id, cow)
+            except Exception as e:
+                print("❌ Herd listener callback error:", str(e))
+
+    def _put(self, cow_id, cow):
+        self._remove(cow_id)
+        self._cows[cow_id] = cow
+        for field in INDEXED_FIELDS:
+            self._indexes[field].setdefault(cow.get(field), set()).add(cow_id)
+        self._sorted_ids = None
+
+    def _remove(self, cow_id):
+        cow = self._cows.pop(cow_id, None)
+        if cow is None:
+            return
+        for field in INDEXED_FIELDS:
+            ids = self._indexes[field].get(cow.get(field))
+            if ids is not None:
+                ids.discard(cow_id)
+                if not ids:
+                    del self._indexes[field][cow.get(field)]
+        self._sorted_ids = None
+
+    # --- Reads (return the cached dicts; callers must not mutate them)
+    def get(self, cow_id):
+        with self._lock:
+            return self._cows.get(cow_id)
+
+    def get_many(self, cow_ids):
+        with self._lock:
+            return {cid: self._cows[cid] for cid in cow_ids if cid in self._cows}
+
+    def ids(self):
+        with self._lock:
+            if self._sorted_ids is None:
+                self._sorted_ids = sorted(self._cows)
+            return self._sorted_ids
+
+    def items(self):
+        with self._lock:
+            return [(cid, self._cows[cid]) for cid in self.ids()]
+
+    def ids_by(self, field, value):
+        with self._lock:
+            return set(self._indexes[field].get(value, ()))
+
+    def counts_by(self, field):
+        with self._lock:
+            return {value: len(ids) for value, ids in self._indexes[field].items()}
+
+    def __len__(self):
+        return len(self._cows)
+
+
+herd = HerdCache()
+
+
+# --- Util: Look up one cow, from memory when the cache is live, else from Firestore
+def get_cow(cow_id):
+    if not cow_id:
+        return None
+    if herd.ready():
+        cow = herd.get(cow_id)
+        if cow is not None:
+            return cow
+    doc = db.collection("cows").document(cow_id).get()
+    return doc.to_dict() if doc.exists else None
+
+
+def get_cows(cow_ids):
+    cow_ids = [cid for cid in cow_ids if cid]
+    found = herd.get_many(cow_ids) if herd.ready() else {}
+    missing = [cid for cid in cow_ids if cid not in found]
+    if missing:
+        found.update(get_docs("cows", missing))
+    return found
@@ -0,0 +1,175 @@
+# server/herd_maintenance.py
+# Nightly recomputation of the derived cow fields that go stale as animals age:
+#   age_months   from dob (calendar months, as compute_age_months)
+#   type         via map_category_to_type, evaluated once per distinct
+#                (category, milk sign, status) combination and broadcast over the herd
+# The pass runs over arrays; only cows whose values changed are written, in
+# chunked batches, so writes scale with the animals that changed, not the herd.
+# category is left as entered: the feeding engine has no heifer plan, so a
+# promoted calf would drop out of feeding plans.
+# Run it once a day from cron (or any single scheduler):
+#   python herd_maintenance.py
+# or on demand via POST /api/maintenance/derived-fields. HERD_MAINTENANCE_SCHEDULE=on
+# also starts a daemon thread that runs it at HERD_MAINTENANCE_HOUR (UTC); only
+# for single-process servers, since every worker process would start its own.
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from flask import Blueprint, jsonify, request
+from firebase_config import db
+from db_helpers import commit_in_batches
+from herd_cache import herd
+from cow_routes import map_category_to_type
+from feeding_engine import age_months_array
+from jobs import job_kind
+
+maintenance_api = Blueprint("maintenance_api", __name__)
+
+MAINTENANCE_HOUR = int(os.environ.get("HERD_MAINTENANCE_HOUR", "2"))
+# "on" runs the nightly thread in this process; leave off under multi-worker servers
+MAINTENANCE_SCHEDULE = os.environ.get("HERD_MAINTENANCE_SCHEDULE", "off")
+
+REPORTS = "maintenance_runs"
+REPORT_ID = "cow_derived_fields"
+
+SOURCE_FIELDS = ["dob", "category", "status", "daily_milk_avg", "age_months", "type"]
+
+_run_lock = threading.Lock()
+
+
+def _load_herd():
+    if herd.ready():
+        return herd.items()
+    return [(d.id, d.to_dict()) for d in db.collection("cows").select(SOURCE_FIELDS).stream()]
+
+
+# --- Core: derived values for the whole herd.
+# cows: [(cow_id, cow_dict)] -> {field: object array} of recomputed values
+def derive_fields(cows, today):
+    ages, has_age = age_months_array([c.get("dob") for _, c in cows], today)
+    age_months = np.where(has_age, ages, None).astype(object)
+
+    # map_category_to_type only looks at milk as zero / positive / negative
+    milk = np.sign(np.array([float(c.get("daily_milk_avg") or 0) for _, c in cows])).astype(np.int64)
+    status = [c.get("status") for _, c in cows]
+    category = [c.get("category") for _, c in cows]
+    keys = [(cat, m, st) for cat, m, st in zip(category, milk.tolist(), status)]
+    distinct = {key: map_category_to_type(*key) for key in set(keys)}
+    types = np.array([distinct[key] for key in keys], dtype=object)
+
+    return {"age_months": age_months, "type": types}
+
+
+# --- Recompute and write back only what changed; returns the run report
+# (with a background job: progress, and a cancel stops it between commits)
+def recompute_derived_fields(today=None, dry_run=False, job=None):
+    with _run_lock:
+        start = time.perf_counter()
+        today = today or datetime.today()
+        cows = _load_herd()
+        changes = {}
+        updated = {}
+        if cows:
+            derived = derive_fields(cows, today)
+            ids = np.array([cid for cid, _ in cows], dtype=object)
+            for field, values in derived.items():
+                current = np.array([c.get(field) for _, c in cows], dtype=object)
+                changed = np.flatnonzero(current != values)
+                updated[field] = len(changed)
+                for i in changed:
+                    value = values[i]
+                    changes.setdefault(ids[i], {})[field] = int(value) if isinstance(value, np.integer) else value
+        if job is not None:
+            job.progress(len(cows), len(cows), message=f"{len(changes)} cows to update")
+
+        commits = 0
+        if changes and not dry_run:
+            commits = commit_in_batches(
+                [("update", db.collection("cows").document(cow_id), fields)
+                 for cow_id, fields in changes.items()],
+                job=job,
+            )
+
+        report = {
+            "scanned": len(cows),
+            "changed": len(changes),
+            "updated": updated,
+            "commits": commits,
+            "dry_run": dry_run,
+            "seconds": round(time.perf_counter() - start, 3),
+            "ranAt": datetime.utcnow(),
+        }
+        if not dry_run:
+            db.collection(REPORTS).document(REPORT_ID).set(report)
+        return report
+
+
+def last_report():
+    snap = db.collection(REPORTS).document(REPORT_ID).get()
+    return snap.to_dict() if snap.exists else None
+
+
+# --- Nightly schedule
+def _seconds_until_next_run(now=None):
+    now = now or datetime.utcnow()
+    run_at = now.replace(hour=MAINTENANCE_HOUR, minute=0, second=0, microsecond=0)
+    if run_at <= now:
+        run_at += timedelta(days=1)
+    return (run_at - now).total_seconds()
+
+
+def _nightly_loop():
+    while True:
+        time.sleep(_seconds_until_next_run())
+        try:
+            report = recompute_derived_fields()
+            print(f"✅ Derived cow fields recomputed: {report['changed']} of {report['scanned']} cows changed")
+        except Exception as e:
+            print("❌ Derived cow field recomputation failed:", str(e))
+
+
+_scheduler = None
+
+
+def start_nightly_maintenance():
+    global _scheduler
+    if _scheduler is None and MAINTENANCE_SCHEDULE != "off":
+        _scheduler = threading.Thread(target=_nightly_loop, daemon=True)
+        _scheduler.start()
+
+
+# Also runnable as a background job: POST /api/jobs/cow_derived_fields {"dry_run": true}
+@job_kind("cow_derived_fields")
+def _derived_fields_job(job, dry_run=False):
+    return recompute_derived_fields(dry_run=bool(dry_run), job=job)
+
+
+# ✅ Run the recomputation now (?dry_run=true reports without writing)
+@maintenance_api.route("/api/maintenance/derived-fields", methods=["POST"])
+def run_derived_fields():
+    try:
+        dry_run = (request.args.get("dry_run") or "").lower() in ("true", "1")
+        report = recompute_derived_fields(dry_run=dry_run)
+        return jsonify({"message": "✅ Derived cow fields recomputed", **report}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# ✅ Last run report
+@maintenance_api.route("/api/maintenance/derived-fields", methods=["GET"])
+def get_derived_fields_report():
+    try:
+        report = last_report()
+        if report is None:
+            return jsonify({"error": "No run recorded yet"}), 404
+        return jsonify(report), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+if __name__ == "__main__":
+    report = recompute_derived_fields()
+    print(f"✅ {report['changed']} of {report['scanned']} cows updated in {report['commits']} commits "
+          f"({report['seconds']}s)")
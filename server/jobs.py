@@ -0,0 +1,290 @@
+# server/jobs.py
+# In-process background jobs for herd-wide work that shouldn't hold an HTTP worker.
+#   POST /api/jobs/<kind>         queue a job (JSON body = params) -> 202 {"id": ...}
+#   GET  /api/jobs/<job_id>       status, progress, result
+#   GET  /api/jobs?kind=&limit=   recent jobs, newest first
+#   POST /api/jobs/<job_id>/cancel
+# Kinds are registered by the modules that own the work:
+#   @job_kind("reflag_healthchecks")
+#   def _reflag_job(job):
+#       return reflag_healthchecks()
+# Jobs run on a thread pool inside an app context. Each kind has its own
+# concurrency limit; submissions over it wait in a per-kind queue. Job state
+# lives in the `jobs` collection, so any process can answer status queries
+# (limits and queues are per process). Cancelling a queued job drops it;
+# cancelling a running one is cooperative: job.check_cancelled() raises
+# JobCancelled once a cancel was requested, from this process or another.
+# Params are checked against the kind's signature on submit (400 if they
+# don't fit). On startup, jobs left queued or running by a process on this
+# host that is no longer alive are marked failed; other hosts' are left alone.
+import inspect
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import Blueprint, request, jsonify
+from firebase_config import db, DESCENDING
+from db_helpers import commit_in_batches, page_query, paged_response
+
+jobs_api = Blueprint("jobs_api", __name__)
+
+JOBS = "jobs"
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+# Progress is persisted (and remote cancels picked up) at most this often
+PROGRESS_SECONDS = 1.0
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+WORKER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobCancelled(Exception):
+    pass
+
+
+# kind -> (fn, max_concurrent, validate)
+_kinds = {}
+
+
+# --- Decorator: register fn(job, **params) as a job kind. `validate(params)`
+# may raise ValueError to reject a submission with a 400.
+def job_kind(kind, max_concurrent=1, validate=None):
+    def decorator(fn):
+        _kinds[kind] = (fn, max_concurrent, validate)
+        return fn
+    return decorator
+
+
+class Job:
+    def __init__(self, job_id, kind, params):
+        self.id = job_id
+        self.kind = kind
+        self.params = params
+        self.ref = db.collection(JOBS).document(job_id)
+        self.progress_state = {"done": 0, "total": None, "message": None}
+        self._cancel = threading.Event()
+        self._flushed = 0.0
+
+    def progress(self, done, total=None, message=None):
+        self.progress_state = {"done": done, "total": total, "message": message}
+        self._flush()
+
+    # Persist progress and pick up remote cancels, at most every PROGRESS_SECONDS
+    def _flush(self):
+        now = time.monotonic()
+        if now - self._flushed < PROGRESS_SECONDS:
+            return
+        self._flushed = now
+        self.ref.update({"progress": self.progress_state})
+        snap = self.ref.get(field_paths=["cancelRequested"])
+        if (snap.to_dict() or {}).get("cancelRequested"):
+            self._cancel.set()
+
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        self._flush()
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+
+class JobRunner:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+        self._app = None
+        self._jobs = {}      # job_id -> Job, queued or running in this process
+        self._running = {}   # kind -> running count
+        self._queued = {}    # kind -> deque of Jobs
+
+    def init_app(self, app):
+        self._app = app
+
+    def submit(self, kind, params=None):
+        fn, limit, validate = _kinds[kind]
+        params = params or {}
+        try:
+            inspect.signature(fn).bind(None, **params)
+        except TypeError as e:
+            raise ValueError(f"Invalid params for {kind}: {e}")
+        if validate is not None:
+            validate(params)
+        job = Job(uuid.uuid4().hex, kind, params)
+        job.ref.set({
+            "id": job.id,
+            "kind": kind,
+            "params": params,
+            "status": QUEUED,
+            "progress": job.progress_state,
+            "cancelRequested": False,
+            "worker": WORKER,
+            "createdAt": datetime.utcnow(),
+        })
+        with self._lock:
+            self._jobs[job.id] = job
+            start = self._running.get(kind, 0) < limit
+            if start:
+                self._running[kind] = self._running.get(kind, 0) + 1
+            else:
+                self._queued.setdefault(kind, deque()).append(job)
+        if start:
+            self._pool.submit(self._run, job)
+        return job.id
+
+    def _run(self, job):
+        fn = _kinds[job.kind][0]
+        try:
+            # Cancelled (possibly from another process) while it was queued
+            snap = job.ref.get(field_paths=["cancelRequested"])
+            if job.cancelled() or (snap.to_dict() or {}).get("cancelRequested"):
+                raise JobCancelled()
+            job.ref.update({"status": RUNNING, "startedAt": datetime.utcnow()})
+            with self._app.app_context():
+                result = fn(job, **job.params)
+            final = {"status": SUCCEEDED, "result": result}
+        except JobCancelled:
+            final = {"status": CANCELLED}
+        except Exception as e:
+            final = {"status": FAILED, "error": str(e)}
+        final.update({"progress": job.progress_state, "finishedAt": datetime.utcnow()})
+        try:
+            job.ref.update(final)
+        except Exception as e:
+            print(f"❌ Could not record the outcome of job {job.id}:", str(e))
+        finally:
+            self._finish(job)
+
+    def _finish(self, job):
+        with self._lock:
+            self._jobs.pop(job.id, None)
+            queue = self._queued.get(job.kind)
+            following = queue.popleft() if queue else None
+            if following is None:
+                self._running[job.kind] -= 1
+        if following is not None:
+            self._pool.submit(self._run, following)
+
+    # Returns the job's status after the request, or None if there is no such job
+    def cancel(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            queue = self._queued.get(job.kind) if job is not None else None
+            dropped = queue is not None and job in queue
+            if dropped:
+                queue.remove(job)
+                self._jobs.pop(job_id, None)
+        ref = db.collection(JOBS).document(job_id)
+        if dropped:
+            ref.update({"status": CANCELLED, "finishedAt": datetime.utcnow()})
+            return CANCELLED
+
+        snap = ref.get()
+        if not snap.exists:
+            return None
+        status = snap.to_dict().get("status")
+        if status in FINISHED:
+            return status
+        ref.update({"cancelRequested": True})
+        if job is not None:
+            job._cancel.set()
+        return "cancelling"
+
+
+runner = JobRunner()
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # exists, owned by someone else
+    return True
+
+
+# --- Util: Mark jobs a restart left queued or running as failed. Only jobs of
+# this host are considered: those of our own pid (a reused pid after a restart;
+# this runner has none yet) or of a pid that is gone. Returns how many.
+def fail_interrupted_jobs():
+    host = socket.gethostname()
+    writes = []
+    for doc in db.collection(JOBS).where("status", "in", [QUEUED, RUNNING]).stream():
+        worker_host, _, pid = (doc.to_dict().get("worker") or "").rpartition(":")
+        if worker_host != host or not pid.isdigit():
+            continue
+        if int(pid) == os.getpid() or not _process_alive(int(pid)):
+            writes.append(("update", doc.reference, {
+                "status": FAILED, "error": "Interrupted by a restart", "finishedAt": datetime.utcnow()}))
+    commit_in_batches(writes)
+    return len(writes)
+
+
+def init_jobs(app):
+    runner.init_app(app)
+    try:
+        failed = fail_interrupted_jobs()
+        if failed:
+            print(f"⚠️ Marked {failed} interrupted job(s) as failed")
+    except Exception as e:
+        print("❌ Could not check for interrupted jobs:", str(e))
+
+
+# ✅ Queue a job
+@jobs_api.route("/api/jobs/<kind>", methods=["POST"])
+def submit_job(kind):
+    if kind not in _kinds:
+        return jsonify({"error": f"Unknown job kind: {kind}"}), 404
+    try:
+        job_id = runner.submit(kind, request.get_json(silent=True) or {})
+        return jsonify({"message": "✅ Job queued", "id": job_id}), 202
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# ✅ Job status, progress and result
+@jobs_api.route("/api/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    try:
+        snap = db.collection(JOBS).document(job_id).get()
+        if not snap.exists:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify(snap.to_dict()), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# ✅ Recent jobs (?kind= needs the jobs (kind, createdAt) index)
+@jobs_api.route("/api/jobs", methods=["GET"])
+def list_jobs():
+    try:
+        query = db.collection(JOBS)
+        if request.args.get("kind"):
+            query = query.where("kind", "==", request.args["kind"])
+        docs, next_cursor = page_query(JOBS, request.args, query=query, order_by="createdAt",
+                                       direction=DESCENDING, default_limit=50)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return paged_response([doc.to_dict() for doc in docs], next_cursor)
+
+
+# ✅ Cancel a job
+@jobs_api.route("/api/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    try:
+        status = runner.cancel(job_id)
+        if status is None:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify({"id": job_id, "status": status}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
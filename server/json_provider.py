@@ -0,0 +1,63 @@
+# server/json_provider.py
+# Flask JSON provider backed by orjson, installed by app.py when orjson is available
+# (otherwise Flask's stdlib provider stays in place).
+#   - datetimes (incl. Firestore DatetimeWithNanoseconds) -> ISO 8601, naive ones as UTC "Z"
+#   - GeoPoint -> {"latitude", "longitude"}; DocumentReference -> its path
+#   - write sentinels (SERVER_TIMESTAMP, DELETE_FIELD) -> null
+#   - numpy scalars/arrays, dates, Decimals and sets are handled too
+from datetime import date, datetime
+from decimal import Decimal
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        # subclasses (DatetimeWithNanoseconds) -> plain datetime, which orjson encodes natively
+        return datetime(value.year, value.month, value.day, value.hour, value.minute,
+                        value.second, value.microsecond, value.tzinfo)
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if hasattr(value, "latitude") and hasattr(value, "longitude"):
+        return {"latitude": value.latitude, "longitude": value.longitude}
+    if hasattr(value, "path") and hasattr(value, "parent"):
+        return value.path
+    if type(value).__name__ in ("Sentinel", "_ServerTimestamp", "_DeleteField"):
+        return None
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class OrjsonProvider(JSONProvider):
+    mimetype = "application/json"
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default, option=OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    # jsonify(): skip the str round-trip and hand orjson's bytes straight to the response
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=_default, option=OPTIONS | orjson.OPT_APPEND_NEWLINE),
+            mimetype=self.mimetype,
+        )
+
+
+def init_json(app):
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
@@ -0,0 +1,458 @@
+# server/local_store.py
+# In-process stand-in for the Firestore client, used when DAIRY_DB_BACKEND=local.
+# It mirrors the subset of the google-cloud-firestore API the blueprints use
+# (collection/document/where/order_by/limit/start_after/select/stream, batches,
+# transactions, get_all, on_snapshot), so routes run unchanged and the API works offline.
+#
+# Stored documents are copy-on-write: a write replaces the dict, never mutates
+# it, so snapshots can share stored dicts and only to_dict() copies.
+import copy
+import enum
+import threading
+import uuid
+from datetime import datetime
+
+ASCENDING = "ASCENDING"
+DESCENDING = "DESCENDING"
+
+
+# --- Write sentinels (same role as firestore.SERVER_TIMESTAMP / firestore.Increment)
+class _ServerTimestamp:
+    def __repr__(self):
+        return "SERVER_TIMESTAMP"
+
+
+SERVER_TIMESTAMP = _ServerTimestamp()
+
+
+class _DeleteField:
+    def __repr__(self):
+        return "DELETE_FIELD"
+
+
+DELETE_FIELD = _DeleteField()
+
+
+ChangeType = enum.Enum("ChangeType", "ADDED REMOVED MODIFIED")
+
+
+class Increment:
+    def __init__(self, value):
+        self.value = value
+
+
+def _resolve(value, current):
+    if value is SERVER_TIMESTAMP:
+        return datetime.utcnow()
+    if isinstance(value, Increment):
+        base = current if isinstance(current, (int, float)) and not isinstance(current, bool) else 0
+        return base + value.value
+    return copy.deepcopy(value)
+
+
+def _get_path(data, path):
+    cur = data
+    for part in path.split("."):
+        if not isinstance(cur, dict) or part not in cur:
+            return None, False
+        cur = cur[part]
+    return cur, True
+
+
+# "__name__" addresses the document id, as in Firestore
+def _field(doc_id, data, path):
+    if path == "__name__":
+        return doc_id, True
+    return _get_path(data, path)
+
+
+def _set_path(data, path, value):
+    parts = path.split(".")
+    cur = data
+    for part in parts[:-1]:
+        if not isinstance(cur.get(part), dict):
+            cur[part] = {}
+        cur = cur[part]
+    if value is DELETE_FIELD:
+        cur.pop(parts[-1], None)
+    else:
+        cur[parts[-1]] = _resolve(value, cur.get(parts[-1]))
+
+
+def _merge(target, source):
+    for key, value in source.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        elif value is DELETE_FIELD:
+            target.pop(key, None)
+        elif isinstance(value, dict):
+            target[key] = {}
+            _merge(target[key], value)
+        else:
+            target[key] = _resolve(value, target.get(key))
+
+
+# Firestore orders values of different types by type first, then by value
+def _sort_key(value):
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, datetime):
+        return (3, value.timestamp())
+    if isinstance(value, str):
+        return (4, value)
+    return (5, str(value))
+
+
+def _matches(doc_id, data, field, op, value):
+    actual, present = _field(doc_id, data, field)
+    if op == "!=":
+        return present and actual != value
+    if not present:
+        return False
+    if op == "==":
+        return actual == value
+    if op == "in":
+        return actual in value
+    if op == "not-in":
+        return actual not in value
+    if op == "array_contains":
+        return isinstance(actual, list) and value in actual
+    if op == "array_contains_any":
+        return isinstance(actual, list) and any(v in actual for v in value)
+    a, b = _sort_key(actual), _sort_key(value)
+    if a[0] != b[0]:
+        return False
+    if op == "<":
+        return a < b
+    if op == "<=":
+        return a <= b
+    if op == ">":
+        return a > b
+    if op == ">=":
+        return a >= b
+    raise ValueError(f"Unsupported operator {op!r}")
+
+
+class DocumentSnapshot:
+    def __init__(self, reference, data, fields=None):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        self._fields = fields
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        if self._data is None:
+            return None
+        data = copy.deepcopy(self._data)
+        if self._fields is not None:
+            projected = {}
+            for field in self._fields:
+                value, present = _get_path(data, field)
+                if present:
+                    _set_path(projected, field, value)
+            return projected
+        return data
+
+    def get(self, field):
+        value, _ = _get_path(self._data or {}, field)
+        return copy.deepcopy(value)
+
+
+class DocumentReference:
+    def __init__(self, client, collection, doc_id):
+        self._client = client
+        self.id = doc_id
+        self.path = f"{collection}/{doc_id}"
+        self._collection = collection
+
+    @property
+    def parent(self):
+        return CollectionReference(self._client, self._collection)
+
+    def get(self, field_paths=None, transaction=None):
+        with self._client._lock:
+            data = self._client._docs(self._collection).get(self.id)
+            return DocumentSnapshot(self, data, field_paths)
+
+    def set(self, data, merge=False):
+        with self._client._lock:
+            docs = self._client._docs(self._collection)
+            existed = self.id in docs
+            doc = copy.deepcopy(docs[self.id]) if merge and existed else {}
+            _merge(doc, data)
+            docs[self.id] = doc
+            change = ChangeType.MODIFIED if existed else ChangeType.ADDED
+            self._client._notify(self._collection, self.id, change, doc)
+
+    def update(self, data):
+        with self._client._lock:
+            docs = self._client._docs(self._collection)
+            if self.id not in docs:
+                raise KeyError(f"No document to update: {self.path}")
+            doc = copy.deepcopy(docs[self.id])
+            for path, value in data.items():
+                _set_path(doc, path, value)
+            docs[self.id] = doc
+            self._client._notify(self._collection, self.id, ChangeType.MODIFIED, doc)
+
+    def delete(self):
+        with self._client._lock:
+            old = self._client._docs(self._collection).pop(self.id, None)
+            if old is not None:
+                self._client._notify(self._collection, self.id, ChangeType.REMOVED, old)
+
+
+class Query:
+    def __init__(self, client, collection, filters=(), orders=(), limit=None,
+                 cursor=None, fields=None):
+        self._client = client
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._cursor = cursor
+        self._fields = fields
+
+    def _copy(self, **changes):
+        params = {
+            "filters": self._filters, "orders": self._orders, "limit": self._limit,
+            "cursor": self._cursor, "fields": self._fields,
+        }
+        params.update(changes)
+        return Query(self._client, self._collection, **params)
+
+    def where(self, field, op, value):
+        return self._copy(filters=self._filters + ((field, op, value),))
+
+    def order_by(self, field, direction=ASCENDING):
+        return self._copy(orders=self._orders + ((field, str(direction).upper()),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def select(self, field_paths):
+        return self._copy(fields=list(field_paths))
+
+    def start_after(self, document_fields_or_snapshot):
+        return self._copy(cursor=document_fields_or_snapshot)
+
+    def _row_key(self, doc_id, data):
+        return [_sort_key(_field(doc_id, data, f)[0]) for f, _ in self._orders] + [_sort_key(doc_id)]
+
+    def _cursor_key(self):
+        cur = self._cursor
+        if isinstance(cur, DocumentSnapshot):
+            return self._row_key(cur.id, cur._data or {})
+        values = [_sort_key(_field(cur.get("__name__"), cur, f)[0]) for f, _ in self._orders]
+        return values + ([_sort_key(cur["__name__"])] if "__name__" in cur else [])
+
+    def _after_cursor(self, row_key, cursor_key):
+        last_direction = self._orders[-1][1] if self._orders else ASCENDING
+        directions = [d for _, d in self._orders] + [last_direction]
+        for a, b, direction in zip(row_key, cursor_key, directions):
+            if a == b:
+                continue
+            return a > b if direction == ASCENDING else a < b
+        return False
+
+    def _run(self):
+        with self._client._lock:
+            items = list(self._client._docs(self._collection).items())
+            rows = []
+            for doc_id, data in items:
+                if not all(_matches(doc_id, data, f, op, v) for f, op, v in self._filters):
+                    continue
+                # Firestore drops documents that lack an ordered field
+                if any(not _field(doc_id, data, f)[1] for f, _ in self._orders):
+                    continue
+                rows.append((doc_id, data))
+
+        last_direction = self._orders[-1][1] if self._orders else ASCENDING
+        rows.sort(key=lambda r: r[0], reverse=last_direction == DESCENDING)
+        for field, direction in reversed(self._orders):
+            rows.sort(key=lambda r: _sort_key(_field(r[0], r[1], field)[0]),
+                      reverse=direction == DESCENDING)
+        if self._cursor is not None:
+            cursor_key = self._cursor_key()
+            rows = [r for r in rows if self._after_cursor(self._row_key(*r), cursor_key)]
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        return rows
+
+    def stream(self, transaction=None):
+        for doc_id, data in self._run():
+            ref = DocumentReference(self._client, self._collection, doc_id)
+            yield DocumentSnapshot(ref, data, self._fields)
+
+    def get(self, transaction=None):
+        return list(self.stream())
+
+    # callback(docs, changes, read_time), like Firestore's on_snapshot. The first
+    # call carries every matching document as ADDED; later calls run synchronously
+    # after each committed write and carry only the changed documents.
+    def on_snapshot(self, callback):
+        return self._client._listen(self, callback)
+
+    def _matches_filters(self, doc_id, data):
+        return all(_matches(doc_id, data, f, op, v) for f, op, v in self._filters)
+
+
+class CollectionReference(Query):
+    def __init__(self, client, name):
+        super().__init__(client, name)
+        self.id = name
+
+    def document(self, doc_id=None):
+        return DocumentReference(self._client, self._collection, doc_id or uuid.uuid4().hex[:20])
+
+    def add(self, data, document_id=None):
+        ref = self.document(document_id)
+        ref.set(data)
+        return datetime.utcnow(), ref
+
+    def list_documents(self):
+        with self._client._lock:
+            ids = list(self._client._docs(self._collection))
+        return [self.document(doc_id) for doc_id in ids]
+
+
+class WriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def set(self, reference, data, merge=False):
+        self._writes.append(lambda: reference.set(data, merge=merge))
+
+    def update(self, reference, data):
+        self._writes.append(lambda: reference.update(data))
+
+    def delete(self, reference):
+        self._writes.append(reference.delete)
+
+    def __len__(self):
+        return len(self._writes)
+
+    # All writes land atomically: either every one applies or none do.
+    # Listeners only hear about the writes once the whole batch has applied.
+    def commit(self):
+        client = self._client
+        with client._lock:
+            saved = {name: dict(docs) for name, docs in client._store.items()}
+            outer_events = client._deferred
+            client._deferred = []
+            try:
+                for write in self._writes:
+                    write()
+            except Exception:
+                client._store = saved
+                client._deferred = outer_events
+                raise
+            events, client._deferred = client._deferred, outer_events
+            for event in events:
+                client._notify(*event)
+        results = [datetime.utcnow()] * len(self._writes)
+        self._writes = []
+        return results
+
+
+class Transaction(WriteBatch):
+    def get(self, ref_or_query):
+        if isinstance(ref_or_query, DocumentReference):
+            return ref_or_query.get()
+        return ref_or_query.stream()
+
+
+# Same calling convention as firestore.transactional: fn(transaction, *args)
+def transactional(fn):
+    def wrapper(transaction, *args, **kwargs):
+        with transaction._client._lock:
+            result = fn(transaction, *args, **kwargs)
+            transaction.commit()
+        return result
+    return wrapper
+
+
+class DocumentChange:
+    def __init__(self, change_type, document):
+        self.type = change_type
+        self.document = document
+
+
+class Watch:
+    def __init__(self, client, query, callback):
+        self._client = client
+        self.query = query
+        self.callback = callback
+
+    def unsubscribe(self):
+        with self._client._lock:
+            listeners = self._client._listeners.get(self.query._collection, [])
+            if self in listeners:
+                listeners.remove(self)
+
+
+class LocalClient:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._store = {}
+        self._listeners = {}
+        self._deferred = None
+
+    def _docs(self, collection):
+        return self._store.setdefault(collection, {})
+
+    # Change feed: fan a committed write out to the collection's listeners
+    def _notify(self, collection, doc_id, change, data):
+        if self._deferred is not None:
+            self._deferred.append((collection, doc_id, change, data))
+            return
+        for watch in list(self._listeners.get(collection, ())):
+            query = watch.query
+            kind = change
+            if not query._matches_filters(doc_id, data):
+                if change is not ChangeType.MODIFIED:
+                    continue
+                # a modified document that stops matching leaves the result set
+                kind = ChangeType.REMOVED
+            snap = DocumentSnapshot(DocumentReference(self, collection, doc_id), data, query._fields)
+            self._call(watch, [snap], [DocumentChange(kind, snap)])
+
+    def _call(self, watch, docs, changes):
+        try:
+            watch.callback(docs, changes, datetime.utcnow())
+        except Exception as e:
+            print("❌ Snapshot listener error:", str(e))
+
+    def _listen(self, query, callback):
+        with self._lock:
+            watch = Watch(self, query, callback)
+            self._listeners.setdefault(query._collection, []).append(watch)
+            docs = query.get()
+            self._call(watch, docs, [DocumentChange(ChangeType.ADDED, d) for d in docs])
+        return watch
+
+    def collection(self, name):
+        return CollectionReference(self, name)
+
+    def collections(self):
+        with self._lock:
+            return [CollectionReference(self, name) for name in self._store]
+
+    def batch(self):
+        return WriteBatch(self)
+
+    def transaction(self, **kwargs):
+        return Transaction(self)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        for ref in references:
+            yield ref.get(field_paths)
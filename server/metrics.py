@@ -0,0 +1,124 @@
+# server/metrics.py
+# Per-request latency and Firestore operation metrics, exposed in Prometheus
+# text format on /metrics.
+#   - init_metrics(app) times every request, labelled by blueprint and route
+#   - document reads, writes and deletes reported by the data layer
+#     (db_events.on_operations) are counted against the request that issued them
+import threading
+import time
+from flask import Blueprint, Response, g, has_request_context, request
+from db_events import on_operations
+
+metrics_api = Blueprint("metrics_api", __name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DOC_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000)
+OPS = ("reads", "writes", "deletes")
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += 1
+        self.sum += value
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = {}       # (blueprint, endpoint, method, status) -> Histogram
+        self.docs_per_request = {}  # (blueprint, endpoint, op) -> Histogram
+        self.ops = {}           # (blueprint, endpoint, op) -> count
+
+    def observe_request(self, labels, seconds, op_counts):
+        blueprint, endpoint = labels[0], labels[1]
+        with self._lock:
+            self.latency.setdefault(labels, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            for op in OPS:
+                key = (blueprint, endpoint, op)
+                self.docs_per_request.setdefault(key, Histogram(DOC_BUCKETS)).observe(op_counts[op])
+                self.ops[key] = self.ops.get(key, 0) + op_counts[op]
+
+    def count_background(self, op, n):
+        with self._lock:
+            key = ("", "background", op)
+            self.ops[key] = self.ops.get(key, 0) + n
+
+    def render(self):
+        lines = []
+        with self._lock:
+            lines += ["# HELP http_request_duration_seconds Request latency by blueprint and route.",
+                      "# TYPE http_request_duration_seconds histogram"]
+            for (blueprint, endpoint, method, status), hist in sorted(self.latency.items()):
+                base = f'blueprint="{blueprint}",endpoint="{_esc(endpoint)}",method="{method}",status="{status}"'
+                lines += _histogram_lines("http_request_duration_seconds", base, hist)
+
+            lines += ["# HELP firestore_documents_per_request Documents read/written/deleted per request.",
+                      "# TYPE firestore_documents_per_request histogram"]
+            for (blueprint, endpoint, op), hist in sorted(self.docs_per_request.items()):
+                base = f'blueprint="{blueprint}",endpoint="{_esc(endpoint)}",op="{op}"'
+                lines += _histogram_lines("firestore_documents_per_request", base, hist)
+
+            lines += ["# HELP firestore_operations_total Firestore document operations.",
+                      "# TYPE firestore_operations_total counter"]
+            for (blueprint, endpoint, op), count in sorted(self.ops.items()):
+                lines.append(f'firestore_operations_total{{blueprint="{blueprint}",endpoint="{_esc(endpoint)}",op="{op}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+def _esc(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _histogram_lines(name, base, hist):
+    lines = []
+    for bound, count in zip(hist.buckets, hist.counts):
+        lines.append(f'{name}_bucket{{{base},le="{bound}"}} {count}')
+    lines.append(f'{name}_bucket{{{base},le="+Inf"}} {hist.total}')
+    lines.append(f"{name}_sum{{{base}}} {hist.sum}")
+    lines.append(f"{name}_count{{{base}}} {hist.total}")
+    return lines
+
+
+registry = Registry()
+
+
+# --- Util: Attribute Firestore operations to the current request (or "background")
+@on_operations
+def record_op(op, n=1):
+    if n <= 0:
+        return
+    if has_request_context() and "_metrics_ops" in g:
+        g._metrics_ops[op] += n
+    else:
+        registry.count_background(op, n)
+
+
+# --- Flask hooks
+def init_metrics(app):
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+        g._metrics_ops = {op: 0 for op in OPS}
+
+    @app.after_request
+    def _observe(response):
+        start = g.pop("_metrics_start", None)
+        if start is not None:
+            rule = request.url_rule.rule if request.url_rule else "unmatched"
+            labels = (request.blueprint or "app", rule, request.method, str(response.status_code))
+            registry.observe_request(labels, time.perf_counter() - start, g.pop("_metrics_ops"))
+        return response
+
+
+@metrics_api.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,146 @@
+# server/milk_rollups.py
+# Pre-aggregated milk totals so /milk-summary reads O(buckets) documents
+# instead of every milk_records document in the window.
+#
+# One document per bucket in `milk_rollups`:
+#   day_YYYY-MM-DD, week_YYYY-MM-DD (Monday of the week), month_YYYY-MM
+#   { "period": "day|week|month", "key": ..., "total": float, "by_cow": {cow_id: float} }
+from datetime import datetime, timedelta
+from firebase_config import db, Increment, transactional
+from db_helpers import commit_in_batches, BATCH_LIMIT
+
+ROLLUPS = "milk_rollups"
+SESSIONS = ("morning", "noon", "evening")
+
+
+# --- Util: Bucket keys for a record date
+def day_key(d):
+    return d.strftime("%Y-%m-%d")
+
+def week_key(d):
+    return (d - timedelta(days=d.weekday())).strftime("%Y-%m-%d")
+
+def month_key(d):
+    return d.strftime("%Y-%m")
+
+def rollup_id(period, key):
+    return f"{period}_{key}"
+
+def rollup_ids_for_date(date_str):
+    d = datetime.strptime(date_str, "%Y-%m-%d")
+    return [
+        rollup_id("day", day_key(d)),
+        rollup_id("week", week_key(d)),
+        rollup_id("month", month_key(d)),
+    ]
+
+# by_cow: {cow_id: change in litres}
+def _rollup_delta(rollup_doc_id, by_cow):
+    period, key = rollup_doc_id.split("_", 1)
+    return {
+        "period": period,
+        "key": key,
+        "total": Increment(sum(by_cow.values())),
+        "by_cow": {cow_id: Increment(delta) for cow_id, delta in by_cow.items()},
+    }
+
+def _merge_record(previous, record):
+    merged = {**previous, **record}
+    daily_total = sum(float(merged.get(s) or 0) for s in SESSIONS)
+    return daily_total, daily_total - float(previous.get("daily_total") or 0)
+
+
+# --- Write a milk record and fold the change into its rollups atomically.
+# Overwrites of an existing {cow_id}_{date} record apply only the delta.
+@transactional
+def _write_record(transaction, record_ref, record):
+    snap = record_ref.get(transaction=transaction)
+    daily_total, delta = _merge_record(snap.to_dict() if snap.exists else {}, record)
+
+    transaction.set(record_ref, {**record, "daily_total": daily_total}, merge=True)
+    if delta:
+        for rid in rollup_ids_for_date(record["date"]):
+            transaction.set(db.collection(ROLLUPS).document(rid),
+                            _rollup_delta(rid, {record["cow_id"]: delta}), merge=True)
+    return daily_total, delta
+
+def save_milk_record(doc_id, record):
+    record_ref = db.collection("milk_records").document(doc_id)
+    return _write_record(db.transaction(), record_ref, record)
+
+
+# --- Bulk variant: many records per transaction, rollup changes summed per bucket
+# so each bucket document is written once per chunk.
+@transactional
+def _write_records_chunk(transaction, records):
+    refs = [db.collection("milk_records").document(doc_id) for doc_id in records]
+    previous = {snap.id: snap.to_dict() for snap in db.get_all(refs, transaction=transaction) if snap.exists}
+
+    totals = {}
+    bucket_deltas = {}
+    for ref in refs:
+        record = records[ref.id]
+        daily_total, delta = _merge_record(previous.get(ref.id, {}), record)
+        transaction.set(ref, {**record, "daily_total": daily_total}, merge=True)
+        totals[ref.id] = daily_total
+        if delta:
+            for rid in rollup_ids_for_date(record["date"]):
+                by_cow = bucket_deltas.setdefault(rid, {})
+                by_cow[record["cow_id"]] = by_cow.get(record["cow_id"], 0) + delta
+    for rid, by_cow in bucket_deltas.items():
+        transaction.set(db.collection(ROLLUPS).document(rid), _rollup_delta(rid, by_cow), merge=True)
+    return totals
+
+# records: {doc_id: record}. Chunks keep records + rollup writes within one batch.
+def save_milk_records_bulk(records):
+    totals = {}
+    chunk, dates = {}, set()
+    for doc_id, record in records.items():
+        new_dates = dates | {record["date"]}
+        if chunk and len(chunk) + 1 + 3 * len(new_dates) > BATCH_LIMIT:
+            totals.update(_write_records_chunk(db.transaction(), chunk))
+            chunk, new_dates = {}, {record["date"]}
+        chunk[doc_id] = record
+        dates = new_dates
+    if chunk:
+        totals.update(_write_records_chunk(db.transaction(), chunk))
+    return totals
+
+
+# --- Read rollups
+def get_rollups(period, keys):
+    refs = [db.collection(ROLLUPS).document(rollup_id(period, k)) for k in keys]
+    found = {snap.id: snap.to_dict() for snap in db.get_all(refs) if snap.exists}
+    return [found.get(rollup_id(period, k)) or {"period": period, "key": k, "total": 0, "by_cow": {}}
+            for k in keys]
+
+
+# --- Rebuild every rollup from milk_records (backfill or repair).
+# Rollups are written before stale ones are removed, so a cancelled job
+# (progress is reported per record) leaves no period without its rollup.
+def rebuild_rollups(job=None):
+    buckets = {}
+    count = 0
+    for snap in db.collection("milk_records").select(["cow_id", "date", "daily_total"]).stream():
+        rec = snap.to_dict()
+        if not rec.get("date") or not rec.get("cow_id"):
+            continue
+        try:
+            ids = rollup_ids_for_date(rec["date"])
+        except ValueError:
+            continue
+        count += 1
+        if job is not None:
+            job.check_cancelled()
+            job.progress(count, message="milk records read")
+        amount = float(rec.get("daily_total") or 0)
+        for rid in ids:
+            period, key = rid.split("_", 1)
+            bucket = buckets.setdefault(rid, {"period": period, "key": key, "total": 0.0, "by_cow": {}})
+            bucket["total"] += amount
+            bucket["by_cow"][rec["cow_id"]] = bucket["by_cow"].get(rec["cow_id"], 0.0) + amount
+
+    stale = [("delete", ref) for ref in db.collection(ROLLUPS).list_documents() if ref.id not in buckets]
+    commit_in_batches([("set", db.collection(ROLLUPS).document(rid), data)
+                       for rid, data in buckets.items()] + stale, job=job)
+    return {"records": count, "rollups": len(buckets), "removed": len(stale)}
@@ -1,46 +1,52 @@
 from flask import Flask, jsonify
-from google.cloud import firestore
 from collections import defaultdict
 from datetime import datetime,timedelta 
-import calendar
 from flask import Blueprint, request, jsonify
-from google.cloud import firestore
-import os
+import csv
+import io
+from firebase_config import db, SERVER_TIMESTAMP
+from db_helpers import page_query, paged_response
+from herd_cache import herd
+from cow_routes import herd_list_response, firestore_cow_page
+from milk_rollups import save_milk_record, save_milk_records_bulk, get_rollups, rebuild_rollups, week_key, month_key, SESSIONS
+from versions import conditional
+from jobs import job_kind
 
-# If not set globally
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "C:/Users/hp/Desktop/DAIRY FARM/dairy-farm-backend/server/serviceAccountKey.json"
-
-
-db = firestore.Client()
 milk_bp = Blueprint("milk_bp", __name__)
 
 # GET /cows
 @milk_bp.route("/cows", methods=["GET"])
+@conditional("cows")
 def get_cows():
-    docs = db.collection("cows").stream()
-    cows = []
-    for d in docs:
-        obj = d.to_dict()
-        obj["id"] = d.id
-        cows.append(obj)
-    return jsonify(cows)
+    try:
+        if herd.ready():
+            return herd_list_response(request.args)
+        cows, next_cursor = firestore_cow_page(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return paged_response(cows, next_cursor)
 
 # GET /milk-records?date=YYYY-MM-DD
 # POST /milk-records
 @milk_bp.route("/milk-records", methods=["GET", "POST"])
+@conditional("milk_records")
 def milk_records():
     if request.method == "GET":
         date = request.args.get("date")
-        if date:
-            docs = db.collection("milk_records").where("date", "==", date).stream()
-        else:
-            docs = db.collection("milk_records").limit(500).stream()
+        try:
+            if date:
+                query = db.collection("milk_records").where("date", "==", date)
+                docs, next_cursor = page_query("milk_records", request.args, query=query)
+            else:
+                docs, next_cursor = page_query("milk_records", request.args, default_limit=500)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         recs = []
         for d in docs:
             obj = d.to_dict()
             obj["id"] = d.id
             recs.append(obj)
-        return jsonify(recs)
+        return paged_response(recs, next_cursor)
 
     # POST: create or update a record
     payload = request.get_json()
@@ -54,23 +60,122 @@ def milk_records():
     evening = float(payload.get("evening", 0))
     milker = payload.get("milker", "")
 
-    daily_total = morning + noon + evening
+    try:
+        datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        return jsonify({"error": "invalid date"}), 400
+
     doc_id = f"{cow_id}_{date}"  # deterministic id so we update same doc
-    doc_ref = db.collection("milk_records").document(doc_id)
-    doc_ref.set({
+    # record + day/week/month rollups are written in one transaction
+    daily_total, _ = save_milk_record(doc_id, {
         "cow_id": cow_id,
         "date": date,
         "morning": morning,
         "noon": noon,
         "evening": evening,
         "milker": milker,
-        "daily_total": daily_total,
-        "updated_at": firestore.SERVER_TIMESTAMP
-    }, merge=True)
-    return jsonify({"ok": True, "doc_id": doc_id})
+        "updated_at": SERVER_TIMESTAMP
+    })
+    return jsonify({"ok": True, "doc_id": doc_id, "daily_total": daily_total})
+
+# --- Util: Rows of a bulk upload, from a JSON array or a CSV body
+# (header cow_id,date,session,litres[,milker]; header row optional)
+BULK_COLUMNS = ["cow_id", "date", "session", "litres", "milker"]
+
+def parse_bulk_rows():
+    if request.is_json:
+        rows = request.get_json(silent=True)
+        if not isinstance(rows, list):
+            raise ValueError("JSON body must be an array of rows")
+        return rows
+    text = request.get_data(as_text=True)
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        return []
+    header = [h.strip().lower() for h in next(csv.reader([lines[0]]))]
+    if "cow_id" in header:
+        reader = csv.DictReader(io.StringIO("\n".join(lines[1:])), fieldnames=header)
+    else:
+        reader = csv.DictReader(io.StringIO("\n".join(lines)), fieldnames=BULK_COLUMNS)
+    return [{k: (v.strip() if isinstance(v, str) else v) for k, v in row.items() if k} for row in reader]
+
+def validate_bulk_row(row):
+    if not isinstance(row, dict):
+        return None, "row must be an object"
+    cow_id = str(row.get("cow_id") or "").strip()
+    date = str(row.get("date") or "").strip()
+    session = str(row.get("session") or "").strip().lower()
+    if not cow_id or not date:
+        return None, "cow_id and date required"
+    try:
+        datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        return None, "invalid date"
+    if session not in SESSIONS:
+        return None, f"session must be {'|'.join(SESSIONS)}"
+    try:
+        litres = float(row.get("litres"))
+    except (TypeError, ValueError):
+        return None, "litres must be a number"
+    if litres < 0:
+        return None, "litres must not be negative"
+    return {"cow_id": cow_id, "date": date, "session": session, "litres": litres,
+            "milker": row.get("milker")}, None
+
+# POST /milk-records/bulk  (JSON array or CSV of cow_id,date,session,litres)
+# Sessions are merged per {cow_id}_{date} document and committed in chunked transactions.
+@milk_bp.route("/milk-records/bulk", methods=["POST"])
+def bulk_milk_records():
+    try:
+        rows = parse_bulk_rows()
+    except (ValueError, csv.Error) as e:
+        return jsonify({"error": str(e)}), 400
+
+    results = []
+    records = {}
+    for i, row in enumerate(rows):
+        clean, error = validate_bulk_row(row)
+        if error:
+            results.append({"row": i, "ok": False, "error": error})
+            continue
+        doc_id = f"{clean['cow_id']}_{clean['date']}"
+        rec = records.setdefault(doc_id, {"cow_id": clean["cow_id"], "date": clean["date"]})
+        rec[clean["session"]] = clean["litres"]
+        if clean["milker"]:
+            rec["milker"] = clean["milker"]
+        rec["updated_at"] = SERVER_TIMESTAMP
+        results.append({"row": i, "ok": True, "doc_id": doc_id})
+
+    if not records:
+        return jsonify({"error": "no valid rows", "results": results}), 400
+
+    totals = save_milk_records_bulk(records)
+    for res in results:
+        if res["ok"]:
+            res["daily_total"] = totals.get(res["doc_id"])
+
+    accepted = sum(1 for res in results if res["ok"])
+    return jsonify({
+        "ok": accepted == len(results),
+        "accepted": accepted,
+        "rejected": len(results) - accepted,
+        "documents": len(records),
+        "results": results,
+    })
+
+# POST /milk-rollups/rebuild  (backfill rollups from existing milk_records)
+@milk_bp.route("/milk-rollups/rebuild", methods=["POST"])
+def rebuild_milk_rollups():
+    return jsonify(rebuild_rollups())
+
+# Same, as a background job: POST /api/jobs/rebuild_milk_rollups
+@job_kind("rebuild_milk_rollups")
+def _rebuild_rollups_job(job):
+    return rebuild_rollups(job)
 
 # GET /milk-summary?date=YYYY-MM-DD&range=day|week|month|month_series
 @milk_bp.route("/milk-summary", methods=["GET"])
+@conditional("milk_rollups", daily=True)
 def milk_summary():
     date_str = request.args.get("date") or datetime.utcnow().strftime("%Y-%m-%d")
     r = request.args.get("range", "day")
@@ -81,56 +186,32 @@ def milk_summary():
         return jsonify({"error": "invalid date"}), 400
 
     if r == "day":
-        docs = db.collection("milk_records").where("date", "==", date_str).stream()
+        bucket = get_rollups("day", [date_str])[0]
     elif r == "week":
         # week Monday..Sunday
-        start = d - timedelta(days=d.weekday())
-        end = start + timedelta(days=6)
-        start_s = start.strftime("%Y-%m-%d")
-        end_s = end.strftime("%Y-%m-%d")
-        docs = db.collection("milk_records").where("date", ">=", start_s).where("date", "<=", end_s).stream()
+        bucket = get_rollups("week", [week_key(d)])[0]
     elif r == "month":
-        start = d.replace(day=1)
-        last_day = calendar.monthrange(d.year, d.month)[1]
-        end = d.replace(day=last_day)
-        start_s = start.strftime("%Y-%m-%d")
-        end_s = end.strftime("%Y-%m-%d")
-        docs = db.collection("milk_records").where("date", ">=", start_s).where("date", "<=", end_s).stream()
+        bucket = get_rollups("month", [month_key(d)])[0]
     elif r == "month_series":
         months = int(request.args.get("months", 12))
         # produce series of last `months` totals: month format YYYY-MM
-        series = []
+        keys = []
         for i in range(months - 1, -1, -1):
-            ym = (d.replace(day=1) - timedelta(days=1)).replace(day=1)  # temporary
             # compute year-month by shifting months
             year = d.year
             month = d.month - i
             while month <= 0:
                 year -= 1
                 month += 12
-            start = datetime(year, month, 1)
-            last_day = calendar.monthrange(year, month)[1]
-            end = datetime(year, month, last_day)
-            start_s = start.strftime("%Y-%m-%d")
-            end_s = end.strftime("%Y-%m-%d")
-            q = db.collection("milk_records").where("date", ">=", start_s).where("date", "<=", end_s).stream()
-            total = 0
-            for rdoc in q:
-                rd = rdoc.to_dict()
-                total += float(rd.get("daily_total", 0))
-            series.append({"month": f"{start.year}-{start.month:02d}", "total": total})
+            keys.append(f"{year}-{month:02d}")
+        series = [{"month": b["key"], "total": b.get("total", 0)} for b in get_rollups("month", keys)]
         return jsonify(series)
 
     else:
         return jsonify({"error": "range must be day|week|month|month_series"}), 400
 
-    total = 0.0
-    cows_totals = {}
-    for ddoc in docs:
-        rdoc = ddoc.to_dict()
-        total += float(rdoc.get("daily_total", 0))
-        cid = rdoc.get("cow_id")
-        cows_totals[cid] = cows_totals.get(cid, 0) + float(rdoc.get("daily_total", 0))
+    total = float(bucket.get("total", 0))
+    cows_totals = {cid: v for cid, v in bucket.get("by_cow", {}).items() if v}
 
     return jsonify({"range": r, "date": date_str, "total": total, "by_cow": cows_totals,
                     "week_total": total if r == "week" else None,
@@ -0,0 +1,160 @@
+# server/notification_feed.py
+# Push delivery and unread counting for notifications.
+#   - counters/notifications holds {"unread": n}. Every write that creates or
+#     reads notifications adjusts it in the same commit, so the badge is one read.
+#   - NotificationFeed listens for new notifications (Firestore on_snapshot, or
+#     the local backend's change feed) and fans them out to subscriber queues,
+#     which /api/notifications/stream relays as Server-Sent Events.
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from firebase_config import db, Increment, transactional
+from db_helpers import BATCH_LIMIT
+
+COUNTER_COLLECTION = "counters"
+UNREAD_COUNTER_ID = "notifications"
+
+# Per-client event buffer; a client that falls this far behind is disconnected
+SUBSCRIBER_QUEUE_SIZE = 256
+POLL_SECONDS = float(os.environ.get("NOTIFICATION_POLL_SECONDS", "5"))
+
+
+# --- Unread counter
+def unread_counter_ref():
+    return db.collection(COUNTER_COLLECTION).document(UNREAD_COUNTER_ID)
+
+
+def unread_increment(n):
+    return {"unread": Increment(n)}
+
+
+def read_unread_count():
+    snap = unread_counter_ref().get()
+    return max((snap.to_dict() or {}).get("unread", 0), 0) if snap.exists else 0
+
+
+# Recount from the collection, for counters created before this existed or after drift
+def rebuild_unread_count():
+    unread = sum(1 for _ in db.collection("notifications").where("read", "==", False).select(["read"]).stream())
+    unread_counter_ref().set({"unread": unread})
+    return unread
+
+
+# --- Mark read: flag + counter decrement in one transaction per chunk.
+# Notifications already read (or missing) are skipped, so the counter stays exact.
+@transactional
+def _mark_read_in_transaction(transaction, notification_ids):
+    refs = [db.collection("notifications").document(nid) for nid in notification_ids]
+    marked = []
+    for snap in db.get_all(refs, field_paths=["read"], transaction=transaction):
+        if snap.exists and not (snap.to_dict() or {}).get("read"):
+            marked.append(snap.id)
+    for nid in marked:
+        transaction.update(db.collection("notifications").document(nid), {"read": True})
+    if marked:
+        transaction.set(unread_counter_ref(), unread_increment(-len(marked)), merge=True)
+    return marked
+
+
+# Returns the ids that were unread and are now read
+def mark_read(notification_ids):
+    notification_ids = list(dict.fromkeys(nid for nid in notification_ids if nid))
+    chunk = BATCH_LIMIT - 1  # leave room for the counter write
+    marked = []
+    for i in range(0, len(notification_ids), chunk):
+        marked += _mark_read_in_transaction(db.transaction(), notification_ids[i:i + chunk])
+    return marked
+
+
+def mark_all_read():
+    unread = db.collection("notifications").where("read", "==", False).select(["read"]).stream()
+    return mark_read([doc.id for doc in unread])
+
+
+# --- Live feed
+class NotificationFeed:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._subscribers = set()
+        self._watches = None
+        self._poller = None
+
+    def start(self):
+        with self._lock:
+            if self._watches is not None or self._poller is not None:
+                return
+            since = datetime.utcnow()
+            try:
+                self._watches = [
+                    db.collection("notifications").where("createdAt", ">=", since)
+                      .on_snapshot(self._on_notifications),
+                    db.collection(COUNTER_COLLECTION).on_snapshot(self._on_counters),
+                ]
+            except Exception as e:
+                print("❌ Notification listener unavailable, polling instead:", str(e))
+                self._poller = threading.Thread(target=self._poll, args=(since,), daemon=True)
+                self._poller.start()
+
+    def stop(self):
+        with self._lock:
+            for watch in self._watches or ():
+                watch.unsubscribe()
+            self._watches = None
+
+    def subscribe(self):
+        self.start()
+        q = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def is_subscribed(self, q):
+        with self._lock:
+            return q in self._subscribers
+
+    def publish(self, event, data):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait((event, data))
+            except queue.Full:
+                self.unsubscribe(q)
+
+    # --- Change handling
+    def _on_notifications(self, docs, changes, read_time):
+        for change in changes:
+            if change.type.name == "ADDED":
+                self.publish("notification", {**change.document.to_dict(), "id": change.document.id})
+
+    def _on_counters(self, docs, changes, read_time):
+        for change in changes:
+            if change.document.id == UNREAD_COUNTER_ID and change.type.name != "REMOVED":
+                self.publish("unread", {"unread": max((change.document.to_dict() or {}).get("unread", 0), 0)})
+
+    def _poll(self, since):
+        last_unread = None
+        while True:
+            try:
+                new = (db.collection("notifications").where("createdAt", ">", since)
+                       .order_by("createdAt").stream())
+                for doc in new:
+                    data = doc.to_dict()
+                    since = max(since, data["createdAt"])
+                    self.publish("notification", {**data, "id": doc.id})
+                unread = read_unread_count()
+                if unread != last_unread:
+                    last_unread = unread
+                    self.publish("unread", {"unread": unread})
+            except Exception as e:
+                print("❌ Notification poll failed:", str(e))
+            time.sleep(POLL_SECONDS)
+
+
+feed = NotificationFeed()
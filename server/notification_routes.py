@@ -1,17 +1,33 @@
-from flask import Blueprint, request, jsonify
-from firebase_config import db
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from firebase_config import db, DESCENDING
+from db_helpers import page_query, paged_response
+from notification_feed import (
+    feed, mark_read, mark_all_read, read_unread_count, rebuild_unread_count,
+    unread_counter_ref, unread_increment,
+)
+from versions import conditional
+from jobs import job_kind
 from datetime import datetime
+import queue
 import uuid
 
 notification_api = Blueprint("notification_api", __name__)
 
+# SSE comment sent when idle, so proxies keep the connection open
+KEEPALIVE_SECONDS = 15
+
 # ✅ Get all notifications
 @notification_api.route("/api/notifications", methods=["GET"])
+@conditional("notifications")
 def get_notifications():
     try:
-        notifications_ref = db.collection("notifications").order_by("createdAt", direction="DESCENDING").stream()
+        notifications_ref, next_cursor = page_query(
+            "notifications", request.args, order_by="createdAt", direction=DESCENDING
+        )
         notifications = [{**doc.to_dict(), "id": doc.id} for doc in notifications_ref]
-        return jsonify(notifications), 200
+        return paged_response(notifications, next_cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -20,12 +36,82 @@ def get_notifications():
 @notification_api.route("/api/notifications/<notification_id>/read", methods=["PUT"])
 def mark_as_read(notification_id):
     try:
-        db.collection("notifications").document(notification_id).update({"read": True})
+        if not mark_read([notification_id]) and not db.collection("notifications").document(notification_id).get().exists:
+            return jsonify({"error": "Notification not found"}), 404
         return jsonify({"message": "✅ Notification marked as read"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+# ✅ Bulk mark as read: {"ids": [...]} or {"all": true}
+@notification_api.route("/api/notifications/read", methods=["PUT"])
+def mark_many_as_read():
+    try:
+        data = request.json or {}
+        if data.get("all"):
+            marked = mark_all_read()
+        elif isinstance(data.get("ids"), list):
+            marked = mark_read(data["ids"])
+        else:
+            return jsonify({"error": "Provide 'ids' (list) or 'all': true"}), 400
+        return jsonify({"message": f"✅ {len(marked)} notifications marked as read", "marked": marked}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# ✅ Unread badge: one counter document read
+@notification_api.route("/api/notifications/unread-count", methods=["GET"])
+def get_unread_count():
+    try:
+        return jsonify({"unread": read_unread_count()}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# ✅ Recount unread notifications into the counter document
+@notification_api.route("/api/notifications/unread-count/rebuild", methods=["POST"])
+def rebuild_unread():
+    try:
+        return jsonify({"message": "✅ Unread count rebuilt", "unread": rebuild_unread_count()}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# Same, as a background job: POST /api/jobs/rebuild_unread_count
+@job_kind("rebuild_unread_count")
+def _rebuild_unread_job(job):
+    return {"unread": rebuild_unread_count()}
+
+
+# ✅ Live feed (Server-Sent Events)
+# Sends the current unread count, then `notification` events as notifications are
+# created and `unread` events whenever the count changes.
+@notification_api.route("/api/notifications/stream", methods=["GET"])
+def stream_notifications():
+    subscriber = feed.subscribe()
+
+    def sse(event, data):
+        return f"event: {event}\ndata: {current_app.json.dumps(data)}\n\n"
+
+    def events():
+        try:
+            yield sse("unread", {"unread": read_unread_count()})
+            while True:
+                try:
+                    event, data = subscriber.get(timeout=KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    if not feed.is_subscribed(subscriber):
+                        return  # dropped for falling behind; the client reconnects
+                    yield ": keep-alive\n\n"
+                    continue
+                yield sse(event, data)
+        finally:
+            feed.unsubscribe(subscriber)
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 # ✅ Create manual notification
 @notification_api.route("/api/notifications", methods=["POST"])
 def create_notification():
@@ -41,7 +127,10 @@ def create_notification():
             "read": False,
             "createdAt": datetime.utcnow()
         }
-        db.collection("notifications").document(notification_id).set(notification_data)
+        batch = db.batch()
+        batch.set(db.collection("notifications").document(notification_id), notification_data)
+        batch.set(unread_counter_ref(), unread_increment(1), merge=True)
+        batch.commit()
         return jsonify({"message": "✅ Notification created", "notification": notification_data}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
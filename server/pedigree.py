@@ -0,0 +1,228 @@
+# server/pedigree.py
+# Pedigree graph over the herd's sire/dam fields, with Wright's coefficients.
+#   kinship(a, b)       probability that alleles drawn from a and b are identical by descent
+#   inbreeding(x)       F of x = kinship of its parents
+#   mating(cow, bull)   expected F of their offspring = kinship(cow, bull)
+#
+# Coefficients come from a cached numerator relationship matrix A (kinship = A / 2),
+# filled with the tabular method, parents before offspring, over every generation recorded:
+#   A[x, y] = (A[sire(x), y] + A[dam(x), y]) / 2     A[x, x] = 1 + A[sire(x), dam(x)] / 2
+# A new cow only appends a row (one vectorised pass over the herd), so registering
+# calves is cheap; the matrix is rebuilt lazily when recorded parents change or a
+# cow is removed. Parents that are not in the herd (AI sires) are unrelated founders.
+# Memory is n^2 float32: about 36 MB for a 3000-animal pedigree.
+import threading
+import numpy as np
+from herd_cache import herd, get_cows
+
+# Offspring F at or above this is flagged (first-cousin mating = 0.0625)
+INBREEDING_WARNING = 0.0625
+
+INITIAL_CAPACITY = 256
+
+# Generations the direct-read fallback follows back from the mating pair
+FALLBACK_GENERATIONS = 4
+
+
+class Pedigree:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._parents = {}   # herd id -> (sire, dam)
+        self._row = {}       # id -> matrix row (herd cows and referenced parents)
+        self._size = 0
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._dirty = True
+        self._built = False
+
+    # --- Maintenance
+    def build(self):
+        with self._lock:
+            if self._built:
+                return True
+            if not herd.ready():
+                return False
+            herd.subscribe(self._on_change)
+            for cow_id, cow in herd.items():
+                self._parents[cow_id] = (cow.get("sire") or None, cow.get("dam") or None)
+            self._built = True
+            return True
+
+    def _on_change(self, kind, cow_id, cow):
+        with self._lock:
+            old = self._parents.get(cow_id)
+            if kind == "REMOVED" or cow is None:
+                self._parents.pop(cow_id, None)
+                self._dirty = True
+                return
+            new = (cow.get("sire") or None, cow.get("dam") or None)
+            self._parents[cow_id] = new
+            if old == new or self._dirty:
+                return
+            if old is None and cow_id not in self._row:
+                self._append(cow_id, *new)  # new calf: one more row
+            else:
+                self._dirty = True  # parents changed, or a founder got a recorded pedigree
+
+    def _ensure_row(self, animal_id):
+        if animal_id is not None and animal_id not in self._row:
+            self._append(animal_id, None, None)  # referenced parent outside the herd
+
+    def _append(self, animal_id, sire, dam):
+        self._ensure_row(sire)
+        self._ensure_row(dam)
+        n = self._size
+        if n == self._matrix.shape[0]:
+            grown = np.zeros((max(INITIAL_CAPACITY, n + n // 2),) * 2, dtype=np.float32)
+            grown[:n, :n] = self._matrix[:n, :n]
+            self._matrix = grown
+        a = self._matrix
+        s, d = self._row.get(sire), self._row.get(dam)
+        row = np.zeros(n, dtype=np.float32)
+        if s is not None:
+            row += 0.5 * a[s, :n]
+        if d is not None:
+            row += 0.5 * a[d, :n]
+        a[n, :n] = row
+        a[:n, n] = row
+        a[n, n] = 1.0 + (0.5 * a[s, d] if s is not None and d is not None else 0.0)
+        self._row[animal_id] = n
+        self._size = n + 1
+
+    def _rebuild(self):
+        self._row = {}
+        self._size = 0
+        self._matrix = np.zeros((len(self._parents) * 9 // 8 + INITIAL_CAPACITY,) * 2, dtype=np.float32)
+        visiting = set()
+
+        # parents before offspring; a cycle in bad data is cut where it closes
+        def add(cow_id):
+            if cow_id in self._row or cow_id in visiting:
+                return
+            visiting.add(cow_id)
+            sire, dam = self._parents.get(cow_id, (None, None))
+            for parent in (sire, dam):
+                if parent in self._parents:
+                    add(parent)
+            visiting.discard(cow_id)
+            self._append(cow_id,
+                         None if sire in visiting else sire,
+                         None if dam in visiting else dam)
+
+        for cow_id in sorted(self._parents):
+            add(cow_id)
+        self._dirty = False
+
+    def _fresh(self):
+        if self._dirty:
+            self._rebuild()
+        return self._matrix
+
+    # --- Coefficients
+    def kinship(self, a, b):
+        if a is None or b is None:
+            return 0.0
+        with self._lock:
+            matrix = self._fresh()
+            i, j = self._row.get(a), self._row.get(b)
+            if i is None or j is None:
+                return 0.5 if a == b else 0.0
+            return float(matrix[i, j]) / 2
+
+    def inbreeding(self, cow_id):
+        with self._lock:
+            matrix = self._fresh()
+            i = self._row.get(cow_id)
+            return float(matrix[i, i]) - 1.0 if i is not None else 0.0
+
+    # Expected F of offspring. Either side may be an id or, for an animal outside
+    # the herd (an AI sire), its (sire, dam) pair.
+    def mating(self, cow, bull):
+        if isinstance(cow, tuple):
+            return 0.5 * (self.mating(cow[0], bull) + self.mating(cow[1], bull))
+        if isinstance(bull, tuple):
+            return self.mating(bull, cow)
+        return self.kinship(cow, bull)
+
+    # Expected F of offspring of `cow` with each of `bull_ids`, in one matrix lookup
+    def mating_many(self, cow, bull_ids):
+        with self._lock:
+            matrix = self._fresh()
+            i = self._row.get(cow)
+            if i is None or not bull_ids:
+                return np.zeros(len(bull_ids))
+            rows = np.array([self._row.get(b, -1) for b in bull_ids], dtype=np.int64)
+            values = matrix[i, np.maximum(rows, 0)].astype(np.float64) / 2
+            values[rows < 0] = 0.0
+            return values
+
+
+pedigree = Pedigree()
+
+
+# --- Util: Rank candidate bulls for a cow by expected offspring inbreeding
+def recommend_bulls(cow_id, limit=None):
+    bulls = herd.get_many(herd.ids_by("category", "bull"))
+    bull_ids = [bid for bid, bull in bulls.items() if bid != cow_id and not bull.get("dead_flag")]
+    coefficients = pedigree.mating_many(cow_id, bull_ids)
+    ranked = [{
+        "bull": bull_id,
+        "name": bulls[bull_id].get("name"),
+        "breed": bulls[bull_id].get("breed"),
+        "inbreeding": round(float(f), 6),
+        "warning": bool(f >= INBREEDING_WARNING),
+    } for bull_id, f in zip(bull_ids, coefficients)]
+    ranked.sort(key=lambda r: (r["inbreeding"], r["bull"]))
+    return ranked[:limit] if limit else ranked
+
+
+# --- Util: Expected offspring F from direct reads of the recorded sire/dam, for
+# when the cached matrix can't be built yet (herd snapshot still loading).
+# Ancestors are read a generation at a time (one get_cows per generation) up to
+# FALLBACK_GENERATIONS back; common ancestors further back are not seen.
+# Sides are ids or (sire, dam) pairs, as in Pedigree.mating.
+def mating_from_reads(cow, bull, generations=FALLBACK_GENERATIONS):
+    parents = {}
+    sides = []
+    for n, animal in enumerate((cow, bull)):
+        if isinstance(animal, tuple):
+            parents[n] = tuple(p or None for p in animal)  # outside the herd: a stand-in key
+            animal = n
+        sides.append(animal)
+
+    frontier = {a for a in sides if not isinstance(a, int)} | {p for pair in parents.values() for p in pair if p}
+    for _ in range(generations):
+        frontier -= parents.keys()
+        if not frontier:
+            break
+        found = get_cows(list(frontier))
+        for animal_id in frontier:
+            record = found.get(animal_id) or {}
+            parents[animal_id] = (record.get("sire") or None, record.get("dam") or None)
+        frontier = {p for animal_id in frontier for p in parents[animal_id] if p}
+
+    # Longest known line of ancestors: always greater than any ancestor's
+    heights = {}
+
+    def height(a):
+        if a not in heights:
+            sire, dam = parents.get(a, (None, None))
+            heights[a] = 1 + max(height(sire) if sire else 0, height(dam) if dam else 0)
+        return heights[a]
+
+    memo = {}
+
+    # Kinship, expanding the animal that can't be an ancestor of the other
+    def kinship(a, b):
+        if a is None or b is None:
+            return 0.0
+        if height(a) < height(b):
+            a, b = b, a
+        if (a, b) not in memo:
+            sire, dam = parents.get(a, (None, None))
+            if a == b:
+                memo[(a, b)] = 0.5 * (1 + kinship(sire, dam))
+            else:
+                memo[(a, b)] = 0.5 * (kinship(sire, b) + kinship(dam, b))
+        return memo[(a, b)]
+
+    return kinship(*sides)
@@ -1,25 +1,23 @@
 from flask import Blueprint, request, jsonify
-import firebase_admin
-from firebase_admin import credentials, firestore
+from firebase_config import db, DESCENDING
+from db_helpers import page_query, paged_response
+from versions import conditional
 import datetime
 
 performance_api = Blueprint("performance_api", __name__)
 
-# ✅ Initialize Firebase app only once
-if not firebase_admin._apps:
-    cred = credentials.Certificate("firebase_config.json")
-    firebase_admin.initialize_app(cred)
-
-db = firestore.client()
 performance_collection = db.collection("performance")
 
 # ✅ Get all performance records
 @performance_api.route("/api/performance", methods=["GET"])
+@conditional("performance")
 def get_performance():
     try:
-        docs = performance_collection.order_by("date", direction=firestore.Query.DESCENDING).stream()
+        docs, next_cursor = page_query("performance", request.args, order_by="date", direction=DESCENDING)
         records = [{**doc.to_dict(), "id": doc.id} for doc in docs]
-        return jsonify(records), 200
+        return paged_response(records, next_cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
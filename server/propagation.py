@@ -0,0 +1,77 @@
+# server/propagation.py
+# Keeps denormalized copies in step with their source documents.
+# PROPAGATIONS declares, per source collection, which target collections copy
+# which of its fields and which target field holds the source id. After a
+# source update, queue_propagation() starts a background job that re-reads the
+# source, finds the dependents with an indexed equality query, and updates
+# those whose copies differ, in batched writes.
+#   queue_propagation("employees", emp_id, update_payload)
+# Jobs of this kind run one at a time (per process), so two quick renames
+# land in order; each job copies the source's current values anyway.
+from firebase_config import db
+from db_helpers import commit_in_batches
+from jobs import job_kind, runner
+
+# source collection -> [(target collection, field holding the source id, {source field: target field})]
+PROPAGATIONS = {
+    "employees": [
+        ("duties", "employee_id", {"name": "employee_name", "department": "department"}),
+    ],
+    "cows": [
+        ("breeding", "cow", {"name": "cowname", "dam": "dam", "sire": "sire"}),
+        ("healthchecks", "cow", {"name": "cowname"}),
+        ("treatments", "cow", {"name": "cowname"}),  # auto-created from health checks
+    ],
+}
+
+
+def source_fields(collection):
+    return {src for _, _, mapping in PROPAGATIONS.get(collection, ()) for src in mapping}
+
+
+# --- Copy `fields` of collection/doc_id to its dependents; returns a report
+def propagate(collection, doc_id, fields=None, job=None):
+    fields = set(fields) if fields is not None else source_fields(collection)
+    report = {"updated": {}, "commits": 0}
+    snap = db.collection(collection).document(doc_id).get()
+    if not snap.exists:
+        return report
+    source = snap.to_dict()
+
+    targets = PROPAGATIONS.get(collection, ())
+    for n, (target, via, mapping) in enumerate(targets):
+        changes = {dst: source.get(src) for src, dst in mapping.items() if src in fields}
+        if not changes:
+            continue
+        if job is not None:
+            job.check_cancelled()
+            job.progress(n, len(targets), message=target)
+        writes = []
+        for doc in db.collection(target).where(via, "==", doc_id).select(list(changes)).stream():
+            current = doc.to_dict() or {}
+            if any(current.get(field) != value for field, value in changes.items()):
+                writes.append(("update", db.collection(target).document(doc.id), changes))
+        report["commits"] += commit_in_batches(writes, job=job)
+        report["updated"][target] = len(writes)
+    return report
+
+
+def _validate_propagation(params):
+    if params.get("collection") not in PROPAGATIONS:
+        raise ValueError(f"No propagation defined for collection: {params.get('collection')}")
+    if not params.get("id"):
+        raise ValueError("id is required")
+
+
+@job_kind("propagate_fields", validate=_validate_propagation)
+def _propagate_job(job, **params):
+    return propagate(params["collection"], params["id"], params.get("fields"), job)
+
+
+# --- Util: After updating collection/doc_id with `changes`, queue propagation of
+# the copied fields it touched; returns the job id, or None if nothing is copied
+def queue_propagation(collection, doc_id, changes):
+    fields = sorted(source_fields(collection) & set(changes))
+    if not fields:
+        return None
+    return runner.submit("propagate_fields", {"collection": collection, "id": doc_id, "fields": fields})
@@ -0,0 +1,145 @@
+# server/side_effects.py
+# Derived-document pipeline: a primary write (health check, treatment,
+# vaccination) and every document it implies (auto treatment, notifications)
+# are committed together in one batch or transaction, so there is one
+# round-trip and no half-written state if something fails. Derived
+# notifications also bump the unread counter in that same commit.
+#
+# DERIVERS maps a collection to functions (doc, changes) -> [(collection, id, data)].
+# `changes` is the full document on create, or the update payload on update.
+from datetime import datetime
+import uuid
+from firebase_config import db, transactional
+from notification_feed import unread_counter_ref, unread_increment
+
+
+# --- Builders
+def build_notification(cow_id, title, message, date=None):
+    return {
+        "id": str(uuid.uuid4()),
+        "cow_id": cow_id,
+        "title": title,
+        "message": message,
+        "date": date or datetime.utcnow().strftime("%Y-%m-%d"),
+        "read": False,
+        "createdAt": datetime.utcnow(),
+    }
+
+
+def build_treatment_from_healthcheck(health_data):
+    return {
+        "id": str(uuid.uuid4()),
+        "healthcheck_id": health_data.get("id"),
+        "cow": health_data.get("cow"),
+        "cowname": health_data.get("cowname"),
+        "disease": health_data.get("diagnosis"),
+        "treatment": "Pending vet prescription",
+        "medicine": "TBD",
+        "dosage": "",
+        "vet": health_data.get("vet"),
+        "start_date": health_data.get("date"),
+        "follow_up_date": "",
+        "notes": f"Auto-created from health check. Symptoms: {health_data.get('symptoms')}",
+        "createdAt": datetime.utcnow(),
+    }
+
+
+# --- Derivers
+def _healthcheck_effects(doc, changes):
+    if not doc.get("flagged"):
+        return []
+    treatment = build_treatment_from_healthcheck(doc)
+    notification = build_notification(
+        doc.get("cow"),
+        "Observation & Treatment Required",
+        f"Cow {doc.get('cow')} diagnosed with {doc.get('diagnosis')}. Treatment auto-created.",
+    )
+    return [("treatments", treatment["id"], treatment),
+            ("notifications", notification["id"], notification)]
+
+
+def _treatment_effects(doc, changes):
+    if not changes.get("next_followup"):
+        return []
+    notification = build_notification(
+        doc.get("cow_id"),
+        "Follow-up Required",
+        f"Follow-up treatment for cow {doc.get('cow_id')} scheduled on {doc['next_followup']}",
+        doc["next_followup"],
+    )
+    return [("notifications", notification["id"], notification)]
+
+
+def _vaccination_effects(doc, changes):
+    if not changes.get("next_booster"):
+        return []
+    notification = build_notification(
+        doc.get("cow_id"),
+        "Booster Due",
+        f"Booster for cow {doc.get('cow_id')} scheduled on {doc['next_booster']}",
+        doc["next_booster"],
+    )
+    return [("notifications", notification["id"], notification)]
+
+
+DERIVERS = {
+    "healthchecks": [_healthcheck_effects],
+    "treatments": [_treatment_effects],
+    "vaccinations": [_vaccination_effects],
+}
+
+
+def derive(collection, doc, changes):
+    derived = []
+    for deriver in DERIVERS.get(collection, ()):
+        derived.extend(deriver(doc, changes))
+    return derived
+
+
+# Derived notifications bump the unread counter in the same commit
+def _unread_delta(derived):
+    return sum(1 for collection, _, _ in derived if collection == "notifications")
+
+
+def _group(derived):
+    grouped = {}
+    for collection, _, data in derived:
+        grouped.setdefault(collection, []).append(data)
+    return grouped
+
+
+# --- Create: primary doc + derived docs in one batch.
+# Returns {collection: [derived docs]}.
+def create_with_side_effects(collection, doc_id, data):
+    derived = derive(collection, data, data)
+    batch = db.batch()
+    batch.set(db.collection(collection).document(doc_id), data)
+    for target, target_id, target_data in derived:
+        batch.set(db.collection(target).document(target_id), target_data)
+    if _unread_delta(derived):
+        batch.set(unread_counter_ref(), unread_increment(_unread_delta(derived)), merge=True)
+    batch.commit()
+    return _group(derived)
+
+
+# --- Update: read, merge, write primary + derived docs in one transaction.
+# Raises KeyError if the document does not exist.
+@transactional
+def _update_in_transaction(transaction, ref, collection, payload):
+    snap = ref.get(transaction=transaction)
+    if not snap.exists:
+        raise KeyError(f"{collection}/{ref.id} not found")
+    merged = {**snap.to_dict(), **payload}
+    derived = derive(collection, merged, payload)
+    transaction.update(ref, payload)
+    for target, target_id, target_data in derived:
+        transaction.set(db.collection(target).document(target_id), target_data)
+    if _unread_delta(derived):
+        transaction.set(unread_counter_ref(), unread_increment(_unread_delta(derived)), merge=True)
+    return merged, _group(derived)
+
+
+# Returns (updated document, {collection: [derived docs]})
+def update_with_side_effects(collection, doc_id, payload):
+    ref = db.collection(collection).document(doc_id)
+    return _update_in_transaction(db.transaction(), ref, collection, payload)
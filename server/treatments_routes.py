@@ -1,5 +1,8 @@
 from flask import Blueprint, request, jsonify
 from firebase_config import db
+from db_helpers import page_query, paged_response
+from side_effects import create_with_side_effects
+from versions import conditional
 from datetime import datetime
 import uuid
 
@@ -26,21 +29,8 @@ def add_treatment():
             "createdAt": datetime.utcnow()
         }
 
-        # Save treatment in Firestore
-        db.collection("treatments").document(treatment_id).set(treatment_data)
-
-        # If follow-up exists, create a notification
-        if data.get("followUp"):
-            notification_data = {
-                "id": str(uuid.uuid4()),
-                "cow_id": data.get("cow"),
-                "title": "Follow-up Required",
-                "message": f"Follow-up treatment for cow {data.get('cow')} scheduled on {data.get('followUp')}",
-                "date": data.get("followUp"),
-                "read": False,
-                "createdAt": datetime.utcnow()
-            }
-            db.collection("notifications").document(notification_data["id"]).set(notification_data)
+        # Save treatment + follow-up notification (if any) in one batched write
+        create_with_side_effects("treatments", treatment_id, treatment_data)
 
         return jsonify({"message": "✅ Treatment added successfully", "treatment": treatment_data}), 201
     except Exception as e:
@@ -49,17 +39,21 @@ def add_treatment():
 
 # ✅ Get all treatments
 @treatment_api.route("/api/treatments", methods=["GET"])
+@conditional("treatments")
 def get_treatments():
     try:
-        treatments_ref = db.collection("treatments").stream()
+        treatments_ref, next_cursor = page_query("treatments", request.args)
         treatments = [doc.to_dict() for doc in treatments_ref]
-        return jsonify(treatments), 200
+        return paged_response(treatments, next_cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 # ✅ Get treatments by cow
 @treatment_api.route("/api/treatments/cow/<cow_id>", methods=["GET"])
+@conditional("treatments")
 def get_treatments_by_cow(cow_id):
     try:
         treatments_ref = db.collection("treatments").where("cow_id", "==", cow_id).stream()
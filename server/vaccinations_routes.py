@@ -1,10 +1,15 @@
 from flask import Blueprint, request, jsonify
 from firebase_config import db
-from datetime import datetime
+from db_helpers import page_query, paged_response
+from side_effects import create_with_side_effects, update_with_side_effects
+from versions import conditional
+from datetime import datetime, timedelta
 import uuid
 
 vaccination_api = Blueprint("vaccination_api", __name__)
 
+BOOSTER_WINDOW_DAYS = 7
+
 # ✅ Create vaccination record
 @vaccination_api.route("/api/vaccinations", methods=["POST"])
 def add_vaccination():
@@ -25,20 +30,8 @@ def add_vaccination():
             "createdAt": datetime.utcnow()
         }
 
-        db.collection("vaccinations").document(vac_id).set(vaccination_data)
-
-        # If next_booster exists, create a notification
-        if vaccination_data["next_booster"]:
-            notification_data = {
-                "id": str(uuid.uuid4()),
-                "cow_id": vaccination_data["cow_id"],
-                "title": "Booster Due",
-                "message": f"Booster for cow {vaccination_data['cow_id']} scheduled on {vaccination_data['next_booster']}",
-                "date": vaccination_data["next_booster"],
-                "read": False,
-                "createdAt": datetime.utcnow()
-            }
-            db.collection("notifications").document(notification_data["id"]).set(notification_data)
+        # Vaccination + booster notification (if any) in one batched write
+        create_with_side_effects("vaccinations", vac_id, vaccination_data)
 
         return jsonify({"message": "✅ Vaccination added successfully", "vaccination": vaccination_data}), 201
 
@@ -48,21 +41,25 @@ def add_vaccination():
 
 # ✅ Get all vaccinations
 @vaccination_api.route("/api/vaccinations", methods=["GET"])
+@conditional("vaccinations")
 def get_vaccinations():
     try:
-        vac_ref = db.collection("vaccinations").stream()
+        vac_ref, next_cursor = page_query("vaccinations", request.args)
         vaccinations = []
         for doc in vac_ref:
             d = doc.to_dict()
             d["id"] = d.get("id", doc.id)
             vaccinations.append(d)
-        return jsonify(vaccinations), 200
+        return paged_response(vaccinations, next_cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 # ✅ Get vaccinations by cow
 @vaccination_api.route("/api/vaccinations/cow/<cow_id>", methods=["GET"])
+@conditional("vaccinations")
 def get_vaccinations_by_cow(cow_id):
     try:
         vac_ref = db.collection("vaccinations").where("cow_id", "==", cow_id).stream()
@@ -90,27 +87,14 @@ def update_vaccination(vac_id):
         }
 
         update_payload = {k: v for k, v in update_payload.items() if v is not None}
-        db.collection("vaccinations").document(vac_id).update(update_payload)
-
-        updated_doc = db.collection("vaccinations").document(vac_id).get()
-        updated_data = updated_doc.to_dict()
+        # Update + booster notification (if booster changed) in one transaction
+        updated_data, _ = update_with_side_effects("vaccinations", vac_id, update_payload)
         updated_data["id"] = updated_data.get("id", vac_id)
 
-        # If booster updated, create a notification
-        if data.get("next_booster"):
-            notification_data = {
-                "id": str(uuid.uuid4()),
-                "cow_id": data.get("cow_id"),
-                "title": "Booster Due",
-                "message": f"Booster for cow {data.get('cow_id')} scheduled on {data.get('next_booster')}",
-                "date": data.get("next_booster"),
-                "read": False,
-                "createdAt": datetime.utcnow()
-            }
-            db.collection("notifications").document(notification_data["id"]).set(notification_data)
-
         return jsonify({"message": "✅ Vaccination updated", "vaccination": updated_data}), 200
 
+    except KeyError:
+        return jsonify({"error": "Vaccination not found"}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -125,34 +109,51 @@ def delete_vaccination(vac_id):
         return jsonify({"error": str(e)}), 500
 
 
+# --- Util: Vaccinations whose next_booster (ISO YYYY-MM-DD) falls in [start, end],
+# as an indexed range query instead of a full scan
+def boosters_due_between(start, end):
+    return (db.collection("vaccinations")
+            .where("next_booster", ">=", start)
+            .where("next_booster", "<=", end)
+            .order_by("next_booster")
+            .stream())
+
+
+# --- Util: Booster alerts for the next BOOSTER_WINDOW_DAYS days
+def compute_booster_alerts(today):
+    alerts = []
+    vac_ref = boosters_due_between(today.strftime("%Y-%m-%d"),
+                                   (today + timedelta(days=BOOSTER_WINDOW_DAYS)).strftime("%Y-%m-%d"))
+
+    for doc in vac_ref:
+        data = doc.to_dict()
+        if not data.get("next_booster"):
+            continue
+
+        try:
+            booster_date = datetime.strptime(data["next_booster"], "%Y-%m-%d").date()
+            diff_days = (booster_date - today).days
+
+            if 0 <= diff_days <= BOOSTER_WINDOW_DAYS:
+                alerts.append({
+                    "id": data.get("id", doc.id),
+                    "cow_id": data.get("cow_id"),
+                    "vaccine": data.get("vaccine"),
+                    "next_booster": data["next_booster"],
+                    "daysRemaining": diff_days
+                })
+        except Exception:
+            continue  # skip invalid date format
+
+    return alerts
+
+
 # 🚨 Get vaccination alerts (boosters due within 7 days)
 @vaccination_api.route("/api/vaccination-alerts", methods=["GET"])
+@conditional("vaccinations", daily=True)
 def get_vaccination_alerts():
     try:
-        vac_ref = db.collection("vaccinations").stream()
-        alerts = []
-        today = datetime.utcnow().date()
-
-        for doc in vac_ref:
-            data = doc.to_dict()
-            if not data.get("next_booster"):
-                continue
-
-            try:
-                booster_date = datetime.strptime(data["next_booster"], "%Y-%m-%d").date()
-                diff_days = (booster_date - today).days
-
-                if 0 <= diff_days <= 7:
-                    alerts.append({
-                        "id": data.get("id", doc.id),
-                        "cow_id": data.get("cow_id"),
-                        "vaccine": data.get("vaccine"),
-                        "next_booster": data["next_booster"],
-                        "daysRemaining": diff_days
-                    })
-            except Exception:
-                continue  # skip invalid date format
-
+        alerts = compute_booster_alerts(datetime.utcnow().date())
         return jsonify(alerts), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
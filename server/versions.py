@@ -0,0 +1,117 @@
+# server/versions.py
+# Per-collection version counters for conditional GETs.
+#   - every write to a versioned collection increments
+#     collection_versions/<collection>.version: inside the same batch or
+#     transaction when there is one (so a failed commit bumps nothing), right
+#     after the write otherwise (data-layer hooks, see db_events.py)
+#   - @conditional("breeding") tags GET responses with an ETag derived from the
+#     versions and the request URL; a matching If-None-Match gets a 304 without
+#     reading the collection
+# Versions are kept in memory by a snapshot listener, so checking one is free.
+import hashlib
+import threading
+from datetime import datetime
+from functools import wraps
+from flask import Response, make_response, request
+from firebase_config import db, Increment, before_commit, after_write
+
+VERSION_COLLECTION = "collection_versions"
+
+VERSIONED_COLLECTIONS = {
+    "cows", "breeding", "healthchecks", "treatments", "vaccinations", "duties",
+    "employees", "feeding_records", "milk_records", "milk_rollups", "performance",
+    "notifications",
+}
+
+READY_TIMEOUT = 5
+
+
+# --- Write side
+def _bumps(collections):
+    for collection in sorted(collections & VERSIONED_COLLECTIONS):
+        ref = db.collection(VERSION_COLLECTION).document(collection)
+        yield ref, {"version": Increment(1), "updatedAt": datetime.utcnow()}
+
+
+@before_commit
+def _bump_in_commit(collections, batch):
+    for ref, bump in _bumps(collections):
+        batch.set(ref, bump, merge=True)
+
+
+@after_write
+def _bump_after_write(collections, batch=None):
+    if batch is None:  # batched writes were bumped in their commit
+        for ref, bump in _bumps(collections):
+            ref.set(bump, merge=True)
+
+
+# --- Read side
+class VersionTracker:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._versions = {}
+        self._ready = threading.Event()
+        self._waited = False
+        self._watch = None
+
+    def start(self):
+        with self._lock:
+            if self._watch is not None:
+                return
+            try:
+                self._watch = db.collection(VERSION_COLLECTION).on_snapshot(self._on_snapshot)
+            except Exception as e:
+                print("❌ Version listener unavailable, reading counters directly:", str(e))
+                self._watch = False
+
+    def _on_snapshot(self, docs, changes, read_time):
+        with self._lock:
+            for change in changes:
+                data = change.document.to_dict() or {}
+                self._versions[change.document.id] = data.get("version", 0)
+        self._ready.set()
+
+    # Only the first call in a process waits for the listener; until its first
+    # snapshot arrives, counters are read directly
+    def get(self, collection):
+        self.start()
+        if not self._waited:
+            self._waited = True
+            self._ready.wait(READY_TIMEOUT if self._watch else 0)
+        if self._watch and self._ready.is_set():
+            with self._lock:
+                return self._versions.get(collection, 0)
+        snap = db.collection(VERSION_COLLECTION).document(collection).get()
+        return (snap.to_dict() or {}).get("version", 0) if snap.exists else 0
+
+
+versions = VersionTracker()
+
+
+# --- Util: ETag for a GET over `collections`; daily=True for responses that
+# also depend on today's date (alerts, "due" flags)
+def collection_etag(collections, daily=False):
+    parts = [f"{c}:{versions.get(c)}" for c in collections]
+    if daily:
+        parts.append(datetime.utcnow().strftime("%Y-%m-%d"))
+    parts.append(request.full_path)
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:20]
+
+
+# --- Decorator: conditional GET for routes that only read `collections`
+def conditional(*collections, daily=False):
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if request.method != "GET":
+                return fn(*args, **kwargs)
+            etag = collection_etag(collections, daily)
+            if request.if_none_match.contains_weak(etag):  # weak: compressed responses carry W/ tags
+                return Response(status=304, headers={"ETag": f'"{etag}"'})
+            resp = make_response(fn(*args, **kwargs))
+            if resp.status_code == 200:
+                resp.set_etag(etag)
+            return resp
+        return wrapper
+    return decorator